@@ -0,0 +1,97 @@
+from django.core.files.storage import default_storage
+
+from games.models import Game, GameReview
+
+# Output name -> values() lookup of every plain field
+GAME_FIELDS = {
+    name: name for name in (
+        'id', 'title', 'subtitle', 'description', 'rating', 'user_rating', 'weighted_rating', 'rank', 'release_date',
+        'version', 'gameplay_duration', 'online', 'offline', 'review_count', 'recommend_count',
+        'total_views', 'monthly_views', 'weekly_views', 'cover', 'banner',
+    )
+}
+
+# Output name -> (many to many field, columns of each related row)
+GAME_RELATIONS = {
+    'genres': ('genres', ('id', 'name', 'slug')),
+    'platforms': ('platforms', ('id', 'name')),
+    'developers': ('developer', ('id', 'name')),
+    'publishers': ('publisher', ('id', 'name')),
+}
+
+REVIEW_FIELDS = {
+    **{name: name for name in ('id', 'game_id', 'score', 'recommend', 'status', 'text', 'created_at')},
+    'author': 'author__username',
+}
+
+REVIEW_RELATIONS = {
+    'platforms': ('platforms', ('id', 'name')),
+}
+
+# Turned from stored names into URLs
+IMAGE_FIELDS = {'cover', 'banner'}
+
+
+def parse_fields(value, fields, relations, default):
+    """
+    The fields a comma separated ?fields= asked for, all of them for '*', or
+    default without one. Raises ValueError naming any unknown field.
+    """
+    if not value:
+        return list(default)
+    if value == '*':
+        return [*fields, *relations]
+    names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in fields and name not in relations]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    return names
+
+
+def columns(names, fields, ordering=()):
+    # values() lookups for the plain fields asked for, the primary key and the ordering columns
+    return list(dict.fromkeys(['pk', *(fields[name] for name in names if name in fields), *(field.lstrip('-') for field in ordering)]))
+
+
+def related_rows(model, field_name, related_columns, ids):
+    # {id: [related row, ...]} of the rows of model with those ids, in one query
+    field = model._meta.get_field(field_name)
+    owner, other = field.m2m_field_name(), field.m2m_reverse_field_name()
+    lookups = [f'{other}__{column}' for column in related_columns]
+    rows = field.remote_field.through.objects.filter(**{f'{owner}_id__in': ids}).order_by('pk').values_list(f'{owner}_id', *lookups)
+    related = {}
+    for pk, *values in rows:
+        related.setdefault(pk, []).append(dict(zip(related_columns, values)))
+    return related
+
+
+def serialize(model, rows, names, fields, relations):
+    """
+    Dicts of just the fields asked for, from rows of values(columns(...)).
+    Every relation asked for is loaded for all the rows with one query.
+    """
+    ids = [row['pk'] for row in rows]
+    loaded = {
+        name: related_rows(model, *relations[name], ids)
+        for name in names if name in relations
+    }
+    results = []
+    for row in rows:
+        result = {}
+        for name in names:
+            if name in loaded:
+                result[name] = loaded[name].get(row['pk'], [])
+            elif name in IMAGE_FIELDS:
+                result[name] = default_storage.url(row[name]) if row[name] else None
+            else:
+                result[name] = row[fields[name]]
+        results.append(result)
+    return results
+
+
+def serialize_games(rows, names):
+    return serialize(Game, rows, names, GAME_FIELDS, GAME_RELATIONS)
+
+
+def serialize_reviews(rows, names):
+    return serialize(GameReview, rows, names, REVIEW_FIELDS, REVIEW_RELATIONS)
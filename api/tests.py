@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from games import search
+from games.models import DeveloperAndPublisher, Game, GameReview, Genre, Platform
+from games.pagination import encode_cursor
+from games.search import search_games
+
+
+class GameApiTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.create(name="Strategy")
+        cls.platform = Platform.objects.create(name="PC")
+        cls.studio = DeveloperAndPublisher.objects.create(name="Api Studio", is_dev=True)
+        cls.games = []
+        for i in range(5):
+            game = Game.objects.create(title=f"Api Game {i}", description="A" * 150, rating=5 + i, user_rating=0,
+                                       gameplay_duration=10, cover=f"covers/{i}.jpg", release_date="2025-01-01")
+            game.genres.add(cls.genre)
+            game.platforms.add(cls.platform)
+            game.developer.add(cls.studio)
+            cls.games.append(game)
+        cls.user = get_user_model().objects.create_user(username='api_reviewer', password='pass1234')
+        for score in (6, 8, 9):
+            review = GameReview.objects.create(game=cls.games[0], author=cls.user, score=score, text="A review for the API test.")
+            review.platforms.add(cls.platform)
+
+    def test_game_list(self):
+        # The page of games, then its genres
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('api_games')).json()
+        game = Game.objects.get(pk=self.games[0].pk)
+        self.assertEqual(data['results'][0], {
+            'id': game.pk, 'title': "Api Game 0", 'rating': 5.0, 'user_rating': game.user_rating,
+            'weighted_rating': game.weighted_rating, 'release_date': '2025-01-01', 'cover': '/media/covers/0.jpg',
+            'genres': [{'id': self.genre.pk, 'name': "Strategy", 'slug': 'strategy'}],
+        })
+        self.assertIsNone(data['next'])
+
+    def test_game_list_cursor_pagination(self):
+        url = reverse('api_games')
+        titles, cursor = [], ''
+        while cursor is not None:
+            data = self.client.get(url, {'ordering': '-rating', 'fields': 'title', 'limit': 2, 'cursor': cursor}).json()
+            titles += [game['title'] for game in data['results']]
+            cursor = data['next']
+        self.assertEqual(titles, [f"Api Game {i}" for i in reversed(range(5))])
+
+    def test_game_list_fields_and_filters(self):
+        data = self.client.get(reverse('api_games'), {'fields': 'id,developers', 'genre': 'strategy', 'limit': 1}).json()
+        self.assertEqual(data['results'], [{'id': self.games[0].pk, 'developers': [{'id': self.studio.pk, 'name': "Api Studio"}]}])
+        self.assertEqual(self.client.get(reverse('api_games'), {'genre': 'puzzle'}).json()['results'], [])
+        data = self.client.get(reverse('api_games'), {'genre': ['strategy', 'puzzle'], 'genre_mode': 'all'}).json()
+        self.assertEqual(data['results'], [])
+
+    def test_game_list_search_keeps_relevance(self):
+        url = reverse('api_games')
+        # Better matches first, however their ids compare
+        Game.objects.filter(pk=self.games[4].pk).update(title="Api Api Api Game 4")
+        search.index_games([self.games[4].pk])
+        expected = [game.pk for game in search_games(Game.objects.all(), 'api')]
+        data = self.client.get(url, {'search': 'api', 'fields': 'id', 'limit': 3}).json()
+        following = self.client.get(url, {'search': 'api', 'fields': 'id', 'limit': 3, 'cursor': data['next']}).json()
+        self.assertEqual([game['id'] for game in data['results'] + following['results']], expected)
+        if search.fts_available():
+            self.assertEqual(expected[0], self.games[4].pk)
+
+        # A cursor of another ordering is turned down
+        response = self.client.get(url, {'search': 'api', 'ordering': 'title', 'cursor': data['next']})
+        self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+    def test_bad_requests(self):
+        url = reverse('api_games')
+        self.assertEqual(self.client.get(url, {'fields': 'title,password'}).json(), {'error': 'Unknown fields: password'})
+        self.assertEqual(self.client.get(url, {'ordering': 'author'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': '!'}).status_code, 400)
+        self.assertEqual(self.client.post(url).status_code, 405)
+
+    def test_bad_cursors(self):
+        bad_cursors = [encode_cursor([{'a': 1}], ['pk']), encode_cursor(['abc', 1], ['rating', 'pk']), encode_cursor([1], ['pk', 'rating'])]
+        for bad_cursor in bad_cursors:
+            for url, params in [(reverse('api_games'), {'ordering': 'rating'}), (reverse('api_games'), {}),
+                                (reverse('api_game_reviews', args=[self.games[0].pk]), {})]:
+                response = self.client.get(url, {**params, 'cursor': bad_cursor})
+                self.assertEqual(response.json(), {'error': 'Invalid cursor'}, (url, params))
+
+    def test_game_detail(self):
+        data = self.client.get(reverse('api_game', args=[self.games[1].pk])).json()
+        self.assertEqual((data['title'], data['banner'], data['platforms']), ("Api Game 1", None, [{'id': self.platform.pk, 'name': "PC"}]))
+        for pk in (9999, 99999999999999999999999):
+            response = self.client.get(reverse('api_game', args=[pk]))
+            self.assertEqual((response.status_code, response.json()), (404, {'error': 'Game not found'}))
+
+    def test_game_reviews(self):
+        url = reverse('api_game_reviews', args=[self.games[0].pk])
+        # The page of reviews with their authors, then their platforms
+        with self.assertNumQueries(2):
+            data = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual([review['score'] for review in data['results']], [9.0, 8.0])
+        self.assertEqual(data['results'][0]['author'], 'api_reviewer')
+        self.assertEqual(data['results'][0]['platforms'], [{'id': self.platform.pk, 'name': "PC"}])
+        data = self.client.get(url, {'limit': 2, 'cursor': data['next'], 'fields': 'score'}).json()
+        self.assertEqual(data['results'], [{'score': 6.0}])
+
+        self.assertEqual(self.client.get(reverse('api_game_reviews', args=[self.games[1].pk])).json()['results'], [])
+        self.assertEqual(self.client.get(reverse('api_game_reviews', args=[9999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_game_reviews', args=[99999999999999999999999])).status_code, 404)
+
+    def test_game_batch(self):
+        url = reverse('api_game_batch')
+        ids = f'{self.games[3].pk},9999,{self.games[1].pk},{self.games[3].pk}'
+        # Cold games are loaded whole, one query per relation
+        with self.assertNumQueries(6):
+            data = self.client.get(url, {'ids': ids, 'fields': 'id,title'}).json()
+        self.assertEqual(data, {
+            'results': [{'id': self.games[3].pk, 'title': "Api Game 3"}, {'id': self.games[1].pk, 'title': "Api Game 1"}],
+            'missing': [9999],
+        })
+
+        # And cached for any fields asked for after, until they change
+        with self.assertNumQueries(1):
+            self.client.get(url, {'ids': [self.games[1].pk, self.games[3].pk]})
+        Game.objects.filter(pk=self.games[1].pk).update(title="Renamed")
+        self.games[1].genres.remove(self.genre)
+        data = self.client.get(url, {'ids': self.games[1].pk, 'fields': 'title,genres'}).json()
+        self.assertEqual(data['results'], [{'title': "Renamed", 'genres': []}])
+
+    def test_game_batch_bad_ids(self):
+        url = reverse('api_game_batch')
+        self.assertEqual(self.client.get(url).json(), {'error': 'ids is required'})
+        self.assertEqual(self.client.get(url, {'ids': '1,two'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': '1,²'}).json(), {'error': 'ids must be numbers'})
+        self.assertEqual(self.client.get(url, {'ids': '1,99999999999999999999999'}).json(), {'error': 'ids out of range'})
+        with self.settings(API_BATCH_MAX_IDS=2):
+            self.assertEqual(self.client.get(url, {'ids': '1,2,3'}).json(), {'error': 'At most 2 ids at a time'})
+            self.assertEqual(self.client.get(url, {'ids': '1,1,1'}).json(), {'error': 'At most 2 ids at a time'})
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from api.views import game_batch_view, game_detail_view, game_list_view, game_reviews_view
+
+urlpatterns = [
+    path('games/', game_list_view, name='api_games'),
+    path('games/batch', game_batch_view, name='api_game_batch'),
+    path('games/<int:pk>', game_detail_view, name='api_game'),
+    path('games/<int:pk>/reviews', game_reviews_view, name='api_game_reviews'),
+]
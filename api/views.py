@@ -0,0 +1,185 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from games.models import Game, GameReview, Genre, pk_in_range
+from games.pagination import ORDERINGS, clean_cursor, decode_cursor, keyset_page
+from games.search import SEARCH_RANK_FIELDS, search_games, search_ordering
+
+from .serializers import (
+    GAME_FIELDS, GAME_RELATIONS, REVIEW_FIELDS, REVIEW_RELATIONS,
+    columns, parse_fields, serialize_games, serialize_reviews,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_LIST_FIELDS = ['id', 'title', 'rating', 'user_rating', 'weighted_rating', 'release_date', 'cover', 'genres']
+
+# Newest first
+REVIEW_ORDERING = ('-pk',)
+
+
+def game_cache_key(pk, updated_at):
+    return f'api_game:{pk}:{updated_at.timestamp()}'
+
+
+def cached_games(ids):
+    """
+    {id: every field of the game} of those of ids that exist.
+
+    Games are cached whole under their updated_at, which moves whenever the
+    game, its reviews, views or relations change, so telling warm games from
+    stale ones takes one query of the primary key index. The rest take one
+    query plus one per relation, however many they are, and are cached for
+    the requests after, whichever fields those pick.
+    """
+    stamps = dict(Game.objects.filter(pk__in=ids).values_list('pk', 'updated_at'))
+    keys = {game_cache_key(pk, updated_at): pk for pk, updated_at in stamps.items()}
+    games = {keys[key]: game for key, game in cache.get_many(keys).items()}
+    missing = [pk for pk in stamps if pk not in games]
+    if missing:
+        names = [*GAME_FIELDS, *GAME_RELATIONS]
+        rows = Game.objects.filter(pk__in=missing).values(*columns(names, GAME_FIELDS))
+        loaded = {game['id']: game for game in serialize_games(list(rows), names)}
+        cache.set_many({game_cache_key(pk, stamps[pk]): game for pk, game in loaded.items()}, getattr(settings, 'API_GAME_CACHE_TTL', 300))
+        games.update(loaded)
+    return games
+
+
+def pick(game, names):
+    return {name: game[name] for name in names}
+
+
+def parse_ids(values):
+    ids = [value.strip() for part in values for value in part.split(',') if value.strip()]
+    if not ids:
+        raise ValueError('ids is required')
+    # Counted as sent, before any of them is converted
+    max_ids = getattr(settings, 'API_BATCH_MAX_IDS', 100)
+    if len(ids) > max_ids:
+        raise ValueError(f'At most {max_ids} ids at a time')
+    if not all(value.isdecimal() for value in ids):
+        raise ValueError('ids must be numbers')
+    # Each game once, in the order it was first asked for
+    ids = list(dict.fromkeys(int(value) for value in ids))
+    if not all(pk_in_range(Game, pk) for pk in ids):
+        raise ValueError('ids out of range')
+    return ids
+
+
+def json_response(data, status=200):
+    # orjson encodes dates itself and is several times faster than json, when it is installed
+    if orjson is not None:
+        return HttpResponse(orjson.dumps(data), content_type='application/json', status=status)
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder)
+
+
+def error_response(message, status=400):
+    return json_response({'error': message}, status)
+
+
+def page_limit(req):
+    try:
+        limit = int(req.GET.get('limit', getattr(settings, 'API_PAGE_SIZE', 20)))
+    except ValueError:
+        raise ValueError('limit must be a number') from None
+    return min(max(limit, 1), getattr(settings, 'API_MAX_PAGE_SIZE', 100))
+
+
+def page_cursor(req, model, ordering, annotations=None):
+    # The cleaned cursor of the request, if it has one
+    if not req.GET.get('cursor'):
+        return None
+    cursor = clean_cursor(decode_cursor(req.GET['cursor']), model, ordering, annotations)
+    if cursor is None:
+        raise ValueError('Invalid cursor')
+    return cursor
+
+
+def page_response(page, results):
+    return json_response({'results': results, 'next': page.next_cursor, 'previous': page.prev_cursor})
+
+
+@require_GET
+def game_list_view(req):
+    try:
+        names = parse_fields(req.GET.get('fields'), GAME_FIELDS, GAME_RELATIONS, DEFAULT_LIST_FIELDS)
+        limit = page_limit(req)
+        orderby = req.GET.get('ordering', '')
+        if orderby not in ORDERINGS:
+            raise ValueError(f'Unknown ordering, use one of: {", ".join(name for name in ORDERINGS if name)}')
+        # Search results keep their relevance order unless asked otherwise
+        search = req.GET.get('search')
+        ordering = search_ordering() if search and not orderby else ORDERINGS[orderby]
+        cursor = page_cursor(req, Game, ordering, SEARCH_RANK_FIELDS)
+    except ValueError as e:
+        return error_response(str(e))
+
+    games = Game.objects.all()
+    if search:
+        games = search_games(games, search)
+    if slugs := set(req.GET.getlist('genre')):
+        match_all = req.GET.get('genre_mode') == 'all'
+        genre_ids = list(Genre.objects.filter(slug__in=slugs).values_list('pk', flat=True))
+        # A genre that does not exist matches no game, so every genre asked for can't either
+        if not genre_ids or match_all and len(genre_ids) < len(slugs):
+            games = games.none()
+        else:
+            games = games.with_genres(genre_ids, match_all)
+
+    # Cursors rather than page numbers, so deep pages cost the same as the first
+    page = keyset_page(games.values(*columns(names, GAME_FIELDS, ordering)), ordering, limit, cursor)
+    return page_response(page, serialize_games(page.object_list, names))
+
+
+@require_GET
+def game_detail_view(req, pk):
+    try:
+        names = parse_fields(req.GET.get('fields'), GAME_FIELDS, GAME_RELATIONS, [*GAME_FIELDS, *GAME_RELATIONS])
+    except ValueError as e:
+        return error_response(str(e))
+
+    # The URL converter takes any number, there is no game past the column's range
+    game = cached_games([pk]).get(pk) if pk_in_range(Game, pk) else None
+    if game is None:
+        return error_response('Game not found', 404)
+    return json_response(pick(game, names))
+
+
+@require_GET
+def game_batch_view(req):
+    try:
+        names = parse_fields(req.GET.get('fields'), GAME_FIELDS, GAME_RELATIONS, DEFAULT_LIST_FIELDS)
+        ids = parse_ids(req.GET.getlist('ids'))
+    except ValueError as e:
+        return error_response(str(e))
+
+    games = cached_games(ids)
+    return json_response({
+        'results': [pick(games[pk], names) for pk in ids if pk in games],
+        'missing': [pk for pk in ids if pk not in games],
+    })
+
+
+@require_GET
+def game_reviews_view(req, pk):
+    try:
+        names = parse_fields(req.GET.get('fields'), REVIEW_FIELDS, REVIEW_RELATIONS, [*REVIEW_FIELDS, *REVIEW_RELATIONS])
+        limit = page_limit(req)
+        cursor = page_cursor(req, GameReview, REVIEW_ORDERING)
+    except ValueError as e:
+        return error_response(str(e))
+    if not pk_in_range(Game, pk):
+        return error_response('Game not found', 404)
+
+    reviews = GameReview.objects.filter(game_id=pk).values(*columns(names, REVIEW_FIELDS, REVIEW_ORDERING))
+    page = keyset_page(reviews, REVIEW_ORDERING, limit, cursor)
+    # Only an empty first page needs telling apart from a missing game
+    if not page.object_list and cursor is None and not Game.objects.filter(pk=pk).exists():
+        return error_response('Game not found', 404)
+    return page_response(page, serialize_reviews(page.object_list, names))
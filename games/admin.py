@@ -5,14 +5,16 @@ from .models import DeveloperAndPublisher, Game, GameReview, Genre, Platform
 
 @admin.register(Game)
 class GameAdmin(admin.ModelAdmin):
-    list_display = ['title', 'offline', 'online', 'rating']
-    list_filter = ['genres', 'developer', 'publisher']
+    list_display = ['title', 'offline', 'online', 'rating', 'rank', 'featured']
+    list_editable = ['featured']
+    list_filter = ['featured', 'genres', 'developer', 'publisher']
     search_fields = ['title', 'developer']
 
 
 @admin.register(Genre)
 class GenreAdmin(admin.ModelAdmin):
-    list_display = ['name']
+    list_display = ['name', 'slug']
+    prepopulated_fields = {'slug': ['name']}
 
 
 @admin.register(DeveloperAndPublisher)
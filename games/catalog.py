@@ -0,0 +1,373 @@
+import csv
+import gzip
+import json
+import os
+from datetime import date
+from itertools import islice
+
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils.text import slugify
+
+from . import featured, ranking, search, sections
+from .images import IMAGE_ERRORS, image_pool, make_variants
+from .models import DeveloperAndPublisher, Game, GameReview, Genre, Platform, unique_slug
+
+# Row key of every many to many field of a game, listing the related names
+RELATIONS = {
+    'developers': 'developer',
+    'publishers': 'publisher',
+    'genres': 'genres',
+    'platforms': 'platforms',
+}
+
+# Separates the names of a relation in a CSV cell
+CSV_LIST_SEPARATOR = '|'
+
+IMAGE_FIELDS = ['cover', 'banner']
+
+
+# Exported fields of each game, the first ones as import_catalog reads them, then the names of its RELATIONS
+GAME_FIELDS = [
+    'id', 'title', 'subtitle', 'description', 'rating', 'release_date', 'version', 'gameplay_duration', 'online', 'offline',
+    'cover', 'banner', 'user_rating', 'review_count', 'recommend_count', 'weighted_rating', 'rank',
+    'total_views', 'monthly_views', 'weekly_views',
+]
+
+# Exported fields of each review, then the names of its platforms
+REVIEW_FIELDS = ['id', 'game_id', 'author_id', 'author_name', 'score', 'recommend', 'status', 'created_at', 'text']
+
+
+def open_dump(path, mode='r'):
+    # Text file, gzipped when its name ends in .gz
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', newline='', encoding='utf-8', compresslevel=6)
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def dump_format(path):
+    return 'csv' if path.removesuffix('.gz').endswith('.csv') else 'jsonl'
+
+
+def read_rows(path):
+    """
+    Yield (line number, row) of every game in a .jsonl or .csv catalog dump,
+    gzipped or not. In CSV files the names of each relation are separated by
+    CSV_LIST_SEPARATOR.
+    """
+    with open_dump(path) as f:
+        if dump_format(path) == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                for key in RELATIONS:
+                    row[key] = [name for name in (row.get(key) or '').split(CSV_LIST_SEPARATOR) if name]
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError as e:
+                        raise ValueError(f'line {number}: {e}') from e
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parse_bool(value):
+    return value in (True, 1) or str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def check_row(row):
+    """
+    Raise what a row would otherwise fail with halfway through writing its
+    batch, or before it: rows that are not objects, a missing or blank
+    title, missing rating or release date, relations that are not lists of
+    names and image paths that are not strings.
+    """
+    if not isinstance(row, dict):
+        raise TypeError(f'expected an object, got {type(row).__name__}')
+    for name in ('title', 'rating', 'release_date'):
+        if name not in row:
+            raise KeyError(name)
+    if not isinstance(row['title'], str) or not row['title'].strip():
+        raise ValueError('title must be a non-empty string')
+    for key in RELATIONS:
+        names = row.get(key)
+        if names is not None and not (isinstance(names, list) and all(isinstance(name, str) for name in names)):
+            raise TypeError(f'{key} must be a list of names')
+    for field in IMAGE_FIELDS:
+        if row.get(field) is not None and not isinstance(row[field], str):
+            raise TypeError(f'{field} must be a file path')
+
+
+def game_from_row(row):
+    # Review stats, views and ranks start empty, as they do for games added in the admin
+    return Game(
+        title=row['title'],
+        subtitle=row.get('subtitle') or None,
+        description=row.get('description') or '',
+        rating=float(row['rating']),
+        release_date=date.fromisoformat(row['release_date']),
+        version=row.get('version') or '1.0.0',
+        gameplay_duration=float(row.get('gameplay_duration') or 0),
+        online=parse_bool(row.get('online')),
+        offline=parse_bool(row.get('offline')),
+        cover=row.get('cover') or '',
+        banner=row.get('banner') or None,
+    )
+
+
+class NameMap:
+    """
+    name -> id of the rows of a model, loaded once and completed in bulk with
+    the names a batch of games refers to that do not exist yet.
+    """
+
+    def __init__(self, model, make=None):
+        self.model = model
+        self.make = make or (lambda name: model(name=name))
+        # Of rows sharing a name, the oldest is used
+        self.ids = dict(model.objects.order_by('-pk').values_list('name', 'pk'))
+        self.created = 0
+
+    def resolve(self, names):
+        missing = {name for name in names if name not in self.ids}
+        if missing:
+            self.model.objects.bulk_create([self.make(name) for name in sorted(missing)])
+            self.ids.update(self.model.objects.filter(name__in=missing).order_by('-pk').values_list('name', 'pk'))
+            self.created += len(missing)
+        return [self.ids[name] for name in names]
+
+    def snapshot(self):
+        return dict(self.ids), self.created
+
+    def restore(self, snapshot):
+        # Back to a snapshot, forgetting rows created by a transaction that was rolled back
+        self.ids, self.created = snapshot
+
+
+def genre_maker():
+    # bulk_create skips Genre.save, so unique slugs are worked out here
+    slugs = set(Genre.objects.values_list('slug', flat=True))
+
+    def make(name):
+        slug = unique_slug(slugify(name) or 'genre', slugs.__contains__)
+        slugs.add(slug)
+        return Genre(name=name, slug=slug)
+    return make
+
+
+def through_insert(field):
+    # INSERT of one row of the through table of a many to many field of Game
+    through = field.remote_field.through._meta
+    columns = [connection.ops.quote_name(through.get_field(name).column) for name in (field.m2m_field_name(), field.m2m_reverse_field_name())]
+    return f'INSERT INTO {connection.ops.quote_name(through.db_table)} ({", ".join(columns)}) VALUES (%s, %s)'
+
+
+def store_image(field, source):
+    """
+    Copy an image file into storage where the field's uploads go and make
+    its thumbnails, returning its name. Runs in worker processes.
+    """
+    game_field = Game._meta.get_field(field)
+    with open(source, 'rb') as f:
+        name = game_field.storage.save(game_field.generate_filename(None, os.path.basename(source)), File(f))
+    make_variants(field, name)
+    return name
+
+
+class CatalogImporter:
+    """
+    Bulk loads games and the studios, genres and platforms they name.
+
+    Each batch of games is written in one transaction: the games with one
+    bulk_create, then the through table rows of each relation with one
+    executemany. Names are resolved through in memory name -> id maps,
+    creating the missing ones along the way. With an images_dir, the cover
+    and banner of each row are files under it, copied into storage and
+    thumbnailed by a pool of worker processes while the batch before is
+    written.
+
+    Signals are bypassed, so the search index, weighted ratings and ranks are
+    updated here instead: per batch for the index, once at the end for the
+    ranks.
+    """
+
+    def __init__(self, batch_size=5000, images_dir=None, workers=None):
+        self.batch_size = batch_size
+        self.images_dir = images_dir
+        self.workers = workers
+        self.imported = 0
+        self.errors = []
+
+    def run(self, rows):
+        rows = self.checked(rows)
+        self.studios = NameMap(DeveloperAndPublisher)
+        self.maps = {
+            'developers': self.studios,
+            'publishers': self.studios,
+            'genres': NameMap(Genre, genre_maker()),
+            'platforms': NameMap(Platform),
+        }
+
+        if not self.images_dir:
+            for batch in batched(rows, self.batch_size):
+                self.write(batch, {})
+        else:
+            # Forked workers must not share the database connections
+            connections.close_all()
+            with image_pool(self.workers) as pool:
+                pending = None
+                for batch in batched(rows, self.batch_size):
+                    images = self.submit_images(pool, batch)
+                    if pending:
+                        self.write(*pending)
+                    pending = batch, images
+                if pending:
+                    self.write(*pending)
+
+        ranking.rebuild_rankings()
+        featured.featured_sampler.mark_stale()
+        sections.bump_catalog_version()
+        return self.imported
+
+    def checked(self, rows):
+        for number, row in rows:
+            try:
+                check_row(row)
+            except (KeyError, TypeError, ValueError) as e:
+                self.error(number, f'{e.__class__.__name__}: {e}')
+            else:
+                yield number, row
+
+    def submit_images(self, pool, batch):
+        return {
+            (number, field): pool.submit(store_image, field, os.path.join(self.images_dir, row[field]))
+            for number, row in batch
+            for field in IMAGE_FIELDS
+            if row.get(field)
+        }
+
+    def error(self, number, message):
+        self.errors.append(f'line {number}: {message}')
+
+    def build(self, batch, images):
+        games = []
+        for number, row in batch:
+            try:
+                game = game_from_row(row)
+            except (KeyError, TypeError, ValueError) as e:
+                self.error(number, f'{e.__class__.__name__}: {e}')
+                continue
+
+            for field in IMAGE_FIELDS:
+                if (number, field) not in images:
+                    continue
+                try:
+                    name = images[number, field].result()
+                except IMAGE_ERRORS as e:
+                    self.error(number, f'{field} not imported, {e}')
+                    setattr(game, field, '' if field == 'cover' else None)
+                else:
+                    setattr(game, field, name)
+                    game.thumbnails[field] = name
+            games.append((game, row))
+        return games
+
+    def write(self, batch, images):
+        games = self.build(batch, images)
+        if not games:
+            return
+
+        snapshots = {relation_map: relation_map.snapshot() for relation_map in self.maps.values()}
+        try:
+            self.write_games(games)
+        except Exception:
+            for relation_map, snapshot in snapshots.items():
+                relation_map.restore(snapshot)
+            raise
+
+    def write_games(self, games):
+        with transaction.atomic():
+            for key, relation_map in self.maps.items():
+                relation_map.resolve({name for _, row in games for name in row.get(key) or []})
+            self.flag_studios(games)
+
+            created = Game.objects.bulk_create([game for game, _ in games])
+            with connection.cursor() as cursor:
+                for key, field_name in RELATIONS.items():
+                    # Plain rows rather than through model instances, which cost more to build than to insert
+                    cursor.executemany(through_insert(Game._meta.get_field(field_name)), [
+                        (game.pk, other_id)
+                        for game, (_, row) in zip(created, games)
+                        # Duplicate names in a row are only linked once
+                        for other_id in dict.fromkeys(self.maps[key].resolve(row.get(key) or []))
+                    ])
+            search.index_games([game.pk for game in created])
+        self.imported += len(created)
+
+    def flag_studios(self, games):
+        for key, flag in (('developers', 'is_dev'), ('publishers', 'is_pub')):
+            ids = self.studios.resolve({name for _, row in games for name in row.get(key) or []})
+            DeveloperAndPublisher.objects.filter(pk__in=ids, **{flag: False}).update(**{flag: True})
+
+
+def relation_names(model, field_name, ids):
+    # {id: [related name, ...]} of the rows of model with those ids, in one query
+    field = model._meta.get_field(field_name)
+    through = field.remote_field.through.objects.filter(**{f'{field.m2m_field_name()}_id__in': ids})
+    names = {}
+    for pk, name in through.order_by('pk').values_list(f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}__name'):
+        names.setdefault(pk, []).append(name)
+    return names
+
+
+def with_relations(model, rows, relations, chunk_size):
+    # Adds the related names of every row, looked up once per chunk of rows
+    for chunk in batched(rows, chunk_size):
+        ids = [row['id'] for row in chunk]
+        names = {key: relation_names(model, field_name, ids) for key, field_name in relations.items()}
+        for row in chunk:
+            for key in relations:
+                row[key] = names[key].get(row['id'], [])
+            yield row
+
+
+def game_rows(chunk_size=2000):
+    """
+    Yield every game as a dict of GAME_FIELDS and RELATIONS names, reading
+    chunk_size games at a time so memory stays flat however many there are.
+    """
+    games = Game.objects.order_by('pk').values(*GAME_FIELDS).iterator(chunk_size=chunk_size)
+    return with_relations(Game, games, RELATIONS, chunk_size)
+
+
+def review_rows(chunk_size=2000):
+    # Same as game_rows, for every review and the names of its platforms
+    fields = [name for name in REVIEW_FIELDS if name != 'author_name']
+    reviews = GameReview.objects.order_by('pk').values(*fields, author_name=F('author__username')).iterator(chunk_size=chunk_size)
+    return with_relations(GameReview, reviews, {'platforms': 'platforms'}, chunk_size)
+
+
+def write_rows(rows, f, fields, fmt):
+    """
+    Write rows to the text file f as JSON lines or CSV, one at a time.
+    Returns the number of rows written.
+    """
+    written = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+    for row in rows:
+        if fmt == 'csv':
+            writer.writerow({key: CSV_LIST_SEPARATOR.join(value) if isinstance(value, list) else value for key, value in row.items()})
+        else:
+            f.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        written += 1
+    return written
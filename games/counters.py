@@ -0,0 +1,149 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, PositiveBigIntegerField, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Now, TruncMonth
+from django.utils import timezone
+
+from .models import Game, GameViewBucket
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+
+def _delta(batch, field='pk'):
+    return Case(*[When(**{field: pk}, then=Value(n)) for pk, n in batch], default=Value(0), output_field=PositiveBigIntegerField())
+
+
+def _add_to_buckets(counts, day, span):
+    # Make sure every bucket exists, then bump them all with a single UPDATE
+    GameViewBucket.objects.bulk_create(
+        [GameViewBucket(game_id=pk, day=day, span=span) for pk, _ in counts],
+        ignore_conflicts=True,
+    )
+    GameViewBucket.objects.filter(day=day, span=span, game_id__in=[pk for pk, _ in counts]).update(
+        count=F('count') + _delta(counts, 'game_id'),
+    )
+
+
+def flush_view_counts(counts, day=None):
+    # One UPDATE ... CASE per batch instead of one UPDATE per game
+    day = day or timezone.localdate()
+    items = sorted(counts.items())
+    with transaction.atomic():
+        for i in range(0, len(items), FLUSH_BATCH_SIZE):
+            batch = items[i:i + FLUSH_BATCH_SIZE]
+            # Games deleted since they were viewed would break the bucket foreign keys
+            existing = set(Game.objects.filter(pk__in=[pk for pk, _ in batch]).values_list('pk', flat=True))
+            batch = [(pk, n) for pk, n in batch if pk in existing]
+            if not batch:
+                continue
+            delta = _delta(batch)
+            Game.objects.filter(pk__in=existing).update(
+                total_views=F('total_views') + delta,
+                monthly_views=F('monthly_views') + delta,
+                weekly_views=F('weekly_views') + delta,
+                updated_at=Now(),
+            )
+            _add_to_buckets(batch, day, GameViewBucket.Span.DAY)
+
+
+def window_views(days, today=None):
+    today = today or timezone.localdate()
+    buckets = GameViewBucket.objects.filter(
+        game=OuterRef('pk'),
+        span=GameViewBucket.Span.DAY,
+        day__gt=today - timedelta(days=days),
+    )
+    return Coalesce(Subquery(buckets.order_by().values('game').annotate(v=Sum('count')).values('v')), 0)
+
+
+def refresh_view_windows(today=None):
+    """
+    Recompute weekly_views and monthly_views as sliding windows over the daily
+    buckets. Only games that have window views to lose are touched.
+    """
+    return Game.objects.filter(Q(weekly_views__gt=0) | Q(monthly_views__gt=0)).update(
+        weekly_views=window_views(7, today),
+        monthly_views=window_views(30, today),
+    )
+
+
+def compact_view_buckets(keep_days=30, today=None):
+    """
+    Fold daily buckets older than keep_days into one bucket per game and month.
+    Returns the number of daily buckets removed.
+    """
+    today = today or timezone.localdate()
+    old = GameViewBucket.objects.filter(span=GameViewBucket.Span.DAY, day__lte=today - timedelta(days=keep_days))
+    months = old.annotate(month=TruncMonth('day')).values_list('month', flat=True).order_by('month').distinct()
+
+    removed = 0
+    for month in list(months):
+        with transaction.atomic():
+            in_month = old.filter(day__gte=month, day__lt=(month + timedelta(days=32)).replace(day=1))
+            totals = list(in_month.order_by().values('game').annotate(total=Sum('count')).values_list('game', 'total'))
+            for i in range(0, len(totals), FLUSH_BATCH_SIZE):
+                _add_to_buckets(totals[i:i + FLUSH_BATCH_SIZE], month, GameViewBucket.Span.MONTH)
+            removed += in_month.delete()[0]
+    return removed
+
+
+class ViewCounter:
+    """
+    Per-process buffer of game page views.
+
+    Hits are only added up in memory; they are written to the database once
+    VIEW_COUNTER_FLUSH_SIZE views are pending or VIEW_COUNTER_FLUSH_INTERVAL
+    seconds have passed since the last flush, and on interpreter exit.
+
+    Flushes leave the catalog version alone: the home page sections ordered
+    by views catch up when their SECTION_CACHE_TTL runs out, and the pages
+    of the viewed games through their updated_at.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, game_id, count=1):
+        with self.lock:
+            self.pending[game_id] += count
+            self.size += count
+            due = (
+                self.size >= getattr(settings, 'VIEW_COUNTER_FLUSH_SIZE', 100)
+                or time.monotonic() - self.last_flush >= getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 30)
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            self.size = 0
+            self.last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            flush_view_counts(pending)
+        except Exception:
+            logger.exception('Could not flush %d game views, keeping them for the next flush', pending.total())
+            with self.lock:
+                self.pending.update(pending)
+                self.size += pending.total()
+            return 0
+        return pending.total()
+
+
+view_counter = ViewCounter()
+atexit.register(view_counter.flush)
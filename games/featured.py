@@ -0,0 +1,97 @@
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Game
+
+
+def game_weight(rating, user_rating, views):
+    # Better rated and more viewed games come up more often, but every game can
+    return (1 + (rating + user_rating) / 2) * math.log2(2 + views)
+
+
+class FeaturedSampler:
+    """
+    Weighted random picks of featured games.
+
+    Keeps every game id in a Vose alias table, so each draw is O(1) however
+    big the catalog is. Games pinned by an admin (Game.featured) always come
+    first. Rebuilt every FEATURED_REFRESH_INTERVAL seconds and after games are
+    saved or deleted in this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = []
+        self.prob = []
+        self.alias = []
+        self.pinned = []
+        self.built_at = None
+
+    @property
+    def stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > getattr(settings, 'FEATURED_REFRESH_INTERVAL', 600)
+
+    def mark_stale(self):
+        self.built_at = None
+
+    def build(self):
+        ids, weights, pinned = [], [], []
+        for pk, rating, user_rating, views, featured in Game.objects.values_list('pk', 'rating', 'user_rating', 'total_views', 'featured').iterator():
+            if featured:
+                pinned.append(pk)
+            else:
+                ids.append(pk)
+                weights.append(game_weight(rating, user_rating, views))
+
+        n = len(ids)
+        total = sum(weights)
+        prob = [w * n / total for w in weights]
+        alias = list(range(n))
+        small = [i for i, p in enumerate(prob) if p < 1]
+        large = [i for i, p in enumerate(prob) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            alias[s] = l
+            prob[l] -= 1 - prob[s]
+            (small if prob[l] < 1 else large).append(l)
+        for i in small + large:
+            prob[i] = 1
+
+        with self.lock:
+            self.ids, self.prob, self.alias, self.pinned = ids, prob, alias, pinned
+            self.built_at = time.monotonic()
+
+    def draw(self):
+        i = random.randrange(len(self.ids))
+        return self.ids[i] if random.random() < self.prob[i] else self.ids[self.alias[i]]
+
+    def sample(self, k):
+        if self.stale:
+            self.build()
+
+        with self.lock:
+            picked = random.sample(self.pinned, min(k, len(self.pinned)))
+            if len(self.ids) <= k - len(picked):
+                return picked + random.sample(self.ids, len(self.ids))
+
+            seen = set(picked)
+            # Redraw duplicates; with k far below the catalog size that is rare
+            for _ in range(k * 20):
+                if len(picked) >= k:
+                    break
+                pk = self.draw()
+                if pk not in seen:
+                    seen.add(pk)
+                    picked.append(pk)
+        return picked
+
+
+featured_sampler = FeaturedSampler()
+
+
+def featured_ids(k=5):
+    return featured_sampler.sample(k)
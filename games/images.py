@@ -0,0 +1,112 @@
+import logging
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+import django
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# Box each variant of an image field is cropped to, sized for where the templates show it
+VARIANTS = {
+    'cover': {'thumb': (320, 450)},
+    'banner': {'thumb': (400, 220), 'hero': (1280, 720)},
+}
+
+# Every variant is saved in each of these, browsers that read WebP are sent that
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+}
+
+# What a missing, broken or oversized image file raises while its variants are made
+IMAGE_ERRORS = (OSError, Image.DecompressionBombError, ValueError)
+
+Thumbnail = namedtuple('Thumbnail', ['url', 'webp_url'])
+
+
+def variant_name(name, variant, ext):
+    # Next to the original: 2025/08/cover/game.png -> 2025/08/cover/game.thumb.webp
+    return f'{os.path.splitext(name)[0]}.{variant}.{ext}'
+
+
+def thumbnail(image, variant, made_from):
+    """
+    URLs of a variant of image, or of the original if its variants were
+    not made from the current file (made_from is the name they were made
+    from).
+    """
+    if not image:
+        return Thumbnail('', None)
+    if made_from != image.name:
+        return Thumbnail(image.url, None)
+    return Thumbnail(*(image.storage.url(variant_name(image.name, variant, ext)) for ext in FORMATS))
+
+
+def make_variants(field, name):
+    """
+    Write every variant of the field's image stored at name, in every format.
+    Module level and free of models so it can run in a worker process.
+    """
+    with default_storage.open(name) as f, Image.open(f) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    for variant, size in VARIANTS[field].items():
+        # Never blown up past the original
+        scale = min(1, image.width / size[0], image.height / size[1])
+        resized = ImageOps.fit(image, (round(size[0] * scale), round(size[1] * scale)), Image.Resampling.LANCZOS)
+        for ext, (fmt, options) in FORMATS.items():
+            buffer = BytesIO()
+            (resized.convert('RGB') if fmt == 'JPEG' else resized).save(buffer, fmt, **options)
+            target = variant_name(name, variant, ext)
+            # Saving over an existing name would get a random suffix instead
+            default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def image_pool(workers=None):
+    # Workers set Django up themselves, so they run whether the platform forks or spawns them
+    return ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+
+
+def remove_variants(field, name):
+    for variant in VARIANTS[field]:
+        for ext in FORMATS:
+            default_storage.delete(variant_name(name, variant, ext))
+
+
+def stale_fields(game):
+    # Image fields whose variants are missing or were made from an older file
+    return [field for field in VARIANTS if getattr(game, field) and game.thumbnails.get(field) != getattr(game, field).name]
+
+
+def build_thumbnails(game):
+    """
+    Make the variants of the game's images that are stale, dropping those
+    of replaced files, and return the new value of Game.thumbnails. Images
+    whose file is missing or unreadable are left for the build_thumbnails
+    command.
+    """
+    thumbnails = dict(game.thumbnails)
+    for field in VARIANTS:
+        name = getattr(game, field).name
+        if thumbnails.get(field) and thumbnails[field] != name:
+            remove_variants(field, thumbnails.pop(field))
+
+    for field in stale_fields(game):
+        name = getattr(game, field).name
+        if not default_storage.exists(name):
+            continue
+        try:
+            make_variants(field, name)
+        except IMAGE_ERRORS:
+            logger.warning('Could not make the variants of %s', name, exc_info=True)
+        else:
+            thumbnails[field] = name
+    return thumbnails
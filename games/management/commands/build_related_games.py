@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from games.sections import bump_catalog_version, bump_recommendations_version
+
+class Command(BaseCommand):
+    help = 'Score how related every pair of games is and store the best matches of each game'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10, help='Number of related games stored per game')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of games scored at a time')
+
+    def handle(self, *args, **kwargs):
+        try:
+            from games.related import rebuild_related_games
+        except ImportError:
+            raise CommandError('Related games need numpy and scipy, install them with: poetry install --extras recommendations')
+
+        written = rebuild_related_games(kwargs['top'], kwargs['chunk_size'])
+        bump_catalog_version()
+        bump_recommendations_version()
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} related games.'))
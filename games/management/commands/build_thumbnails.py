@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from games.images import IMAGE_ERRORS, VARIANTS, image_pool, make_variants, stale_fields
+from games.models import Game
+from games.sections import bump_catalog_version
+
+class Command(BaseCommand):
+    help = 'Make the thumbnails of every game cover and banner that does not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of images resized at a time')
+        parser.add_argument('--all', action='store_true', help='Remake every thumbnail, for when the variant sizes changed')
+
+    def handle(self, *args, **kwargs):
+        games = list(Game.objects.only('pk', 'cover', 'banner', 'thumbnails'))
+        jobs = [
+            (game, field)
+            for game in games
+            for field in ([field for field in VARIANTS if getattr(game, field)] if kwargs['all'] else stale_fields(game))
+        ]
+        if not jobs:
+            self.stdout.write(self.style.SUCCESS('Every image has its thumbnails.'))
+            return
+
+        # Forked workers must not share the database connections
+        connections.close_all()
+        done, failed = {}, 0
+        with image_pool(kwargs['workers']) as pool:
+            futures = {pool.submit(make_variants, field, getattr(game, field).name): (game, field) for game, field in jobs}
+            for future in as_completed(futures):
+                game, field = futures[future]
+                try:
+                    future.result()
+                except IMAGE_ERRORS as e:
+                    failed += 1
+                    self.stderr.write(f'{getattr(game, field).name}: {e}')
+                    continue
+                game.thumbnails[field] = getattr(game, field).name
+                done[game.pk] = game
+
+        # Moving updated_at drops the cached cards still pointing at the originals
+        now = timezone.now()
+        for game in done.values():
+            game.updated_at = now
+        Game.objects.bulk_update(done.values(), ['thumbnails', 'updated_at'], batch_size=500)
+        bump_catalog_version()
+
+        made = len(jobs) - failed
+        self.stdout.write(self.style.SUCCESS(f'Made the thumbnails of {made} images of {len(done)} games.'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} images could not be read.'))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from games.models import Game
+from games.pagination import ORDERINGS
+from games.sections import SECTIONS, section_queryset
+
+def hot_queries():
+    for name in SECTIONS:
+        yield f'home section {name}', section_queryset(name)
+    yield 'top views sidebar', Game.objects.order_by('-total_views')[:6]
+    for name, ordering in ORDERINGS.items():
+        # Primary key order reads the table itself in order, which needs no index
+        if name:
+            yield f'game list ordered by {name}', Game.objects.order_by(*ordering)[:16]
+            yield f'game list ordered by {name}, filtered by genre', Game.objects.with_genres([1]).order_by(*ordering)[:16]
+
+def full_scans(plan):
+    # Every line of SQLite's EXPLAIN QUERY PLAN is "id parent notused detail"
+    for line in plan.splitlines():
+        detail = line.split(maxsplit=3)[-1]
+        if detail.startswith('SCAN ') and ' USING ' not in detail or 'TEMP B-TREE' in detail:
+            yield detail
+
+class Command(BaseCommand):
+    help = 'Fail if a hot catalog query scans or sorts the whole games table instead of reading an index'
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Query plans can only be checked on SQLite.')
+
+        failed = []
+        for label, queryset in hot_queries():
+            plan = queryset.explain()
+            if kwargs['verbosity'] > 1:
+                self.stdout.write(f'{label}:\n{plan}')
+            failed += [f'{label}: {detail}' for detail in full_scans(plan)]
+
+        if failed:
+            raise CommandError('Full scans found:\n' + '\n'.join(failed))
+        self.stdout.write(self.style.SUCCESS('Every hot query reads an index.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from games.counters import compact_view_buckets
+
+class Command(BaseCommand):
+    help = 'Fold old daily view buckets into monthly ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=30, help='Days of daily buckets to keep (at least 30)')
+
+    def handle(self, *args, **kwargs):
+        keep_days = kwargs['keep_days']
+        if keep_days < 30:
+            raise CommandError('The monthly window needs at least 30 days of daily buckets.')
+
+        removed = compact_view_buckets(keep_days)
+        self.stdout.write(self.style.SUCCESS(f'Compacted {removed} daily view buckets.'))
@@ -0,0 +1,43 @@
+import gzip
+import io
+import sys
+
+from django.core.management.base import BaseCommand
+
+from games.catalog import GAME_FIELDS, RELATIONS, REVIEW_FIELDS, dump_format, game_rows, open_dump, review_rows, write_rows
+
+def open_stdout(compress):
+    stream = gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb', compresslevel=6) if compress else sys.stdout.buffer
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=True)
+
+class Command(BaseCommand):
+    help = 'Stream every game or every review to a JSONL or CSV dump, gzipped when its name ends in .gz'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['games', 'reviews'])
+        parser.add_argument('--output', default='-', help='Path of the dump, - for standard output')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Defaults to the extension of the output, then jsonl')
+        parser.add_argument('--gzip', action='store_true', help='Compress standard output')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Number of rows read from the database at a time')
+
+    def handle(self, *args, **kwargs):
+        output = kwargs['output']
+        fmt = kwargs['format'] or dump_format(output)
+        if kwargs['kind'] == 'games':
+            rows, fields = game_rows(kwargs['chunk_size']), GAME_FIELDS + list(RELATIONS)
+        else:
+            rows, fields = review_rows(kwargs['chunk_size']), REVIEW_FIELDS + ['platforms']
+
+        if output == '-':
+            f = open_stdout(kwargs['gzip'])
+            written = write_rows(rows, f, fields, fmt)
+            # Standard output itself stays open, only the gzip stream on top of it is ended
+            stream = f.detach()
+            if kwargs['gzip']:
+                stream.close()
+            # Keeps the dump on standard output clean
+            self.stderr.write(f'Exported {written} {kwargs["kind"]}.')
+        else:
+            with open_dump(output, 'w') as f:
+                written = write_rows(rows, f, fields, fmt)
+            self.stdout.write(self.style.SUCCESS(f'Exported {written} {kwargs["kind"]} to {output}.'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from games.catalog import CatalogImporter, read_rows
+
+class Command(BaseCommand):
+    help = 'Bulk load games, with the studios, genres and platforms they name, from a .jsonl or .csv dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog dump, one game per line or CSV row')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of games written per transaction')
+        parser.add_argument('--images-dir', help='Directory the cover and banner paths of the dump are relative to; '
+                                                 'without it they are taken as names already in media storage')
+        parser.add_argument('--workers', type=int, default=None, help='Number of images copied and thumbnailed at a time')
+
+    def handle(self, *args, **kwargs):
+        importer = CatalogImporter(kwargs['batch_size'], kwargs['images_dir'], kwargs['workers'])
+        try:
+            imported = importer.run(read_rows(kwargs['path']))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'{e}, {importer.imported} games were imported before it.')
+
+        for error in importer.errors:
+            self.stderr.write(error)
+        created = ', '.join(f'{relation_map.created} {key}' for key, relation_map in importer.maps.items() if key != 'publishers')
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} games, created {created}.'))
+        if importer.errors:
+            self.stdout.write(self.style.WARNING(f'{len(importer.errors)} rows or images were skipped.'))
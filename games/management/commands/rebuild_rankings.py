@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from games.ranking import rebuild_rankings
+from games.sections import bump_catalog_version
+
+class Command(BaseCommand):
+    help = 'Recompute the rating prior, the weighted rating and the rank of every game'
+
+    def handle(self, *args, **kwargs):
+        ranked = rebuild_rankings()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Ranked {ranked} games.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from games.models import Game
+from games.ranking import rebuild_rankings
+from games.sections import bump_catalog_version
+
+class Command(BaseCommand):
+    help = 'Recompute the stored review count, score sum, recommend count and rank of every game'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of games updated per transaction')
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs['batch_size']
+        ids = Game.objects.order_by('pk').values_list('pk', flat=True)
+        updated = 0
+        last_id = 0
+
+        # Walk the table in primary key ranges so no single write holds the lock for long
+        while True:
+            batch = list(ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                updated += Game.objects.filter(pk__gte=batch[0], pk__lte=batch[-1]).rebuild_review_stats()
+            last_id = batch[-1]
+
+        # Weighted ratings and ranks are derived from the stats
+        rebuild_rankings()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt review stats for {updated} games.'))
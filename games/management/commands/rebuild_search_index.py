@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from games import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of the games catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of games indexed per batch')
+
+    def handle(self, *args, **kwargs):
+        if not search.fts_available():
+            raise CommandError('The database has no full-text search table, search falls back to substring matching.')
+
+        indexed = search.rebuild_index(kwargs['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} games.'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from games.sections import bump_catalog_version, bump_recommendations_version
+
+class Command(BaseCommand):
+    help = 'Refresh the "players who liked this also liked" neighbours of games whose reviews changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Refresh every game, not only the ones whose reviews changed')
+        parser.add_argument('--top', type=int, default=20, help='Number of neighbours stored per game')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of games compared at a time')
+
+    def handle(self, *args, **kwargs):
+        try:
+            from games.neighbours import refresh_neighbours
+        except ImportError:
+            raise CommandError('Game neighbours need numpy and scipy, install them with: poetry install --extras recommendations')
+
+        refreshed = refresh_neighbours(kwargs['top'], kwargs['chunk_size'], kwargs['full'])
+        bump_catalog_version()
+        bump_recommendations_version()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed the neighbours of {refreshed} games.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from games.counters import refresh_view_windows
+from games.sections import bump_catalog_version
+
+class Command(BaseCommand):
+    help = 'Recompute weekly and monthly views from the daily view buckets'
+
+    def handle(self, *args, **kwargs):
+        updated = refresh_view_windows()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed view windows for {updated} games.'))
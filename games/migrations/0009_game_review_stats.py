@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_review_stats(apps, schema_editor):
+    Game = apps.get_model('games', 'Game')
+    GameReview = apps.get_model('games', 'GameReview')
+
+    reviews = GameReview.objects.filter(game=OuterRef('pk')).order_by().values('game')
+    Game.objects.update(
+        review_count=Coalesce(Subquery(reviews.annotate(v=Count('pk')).values('v')), 0),
+        score_sum=Coalesce(Subquery(reviews.annotate(v=Sum('score')).values('v')), 0.0),
+        recommend_count=Coalesce(Subquery(reviews.annotate(v=Count('pk', filter=Q(recommend=True))).values('v')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0008_gameview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='recommend_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='score_sum',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_review_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0009_game_review_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('span', models.PositiveSmallIntegerField(choices=[(1, 'Day'), (2, 'Month')], default=1)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='games.game')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['span', 'day'], name='game_view_bucket_span_day')],
+                'constraints': [models.UniqueConstraint(fields=('game', 'day', 'span'), name='unique_game_view_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 06:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicate_views(apps, schema_editor):
+    GameView = apps.get_model('games', 'GameView')
+
+    keep = GameView.objects.values('user', 'game').annotate(first=Min('pk')).values('first')
+    GameView.objects.exclude(pk__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0010_gameviewbucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_views, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='gameview',
+            constraint=models.UniqueConstraint(fields=('user', 'game'), name='unique_game_view'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:10
+
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        if 'ENABLE_FTS5' not in {row[0] for row in cursor.fetchall()}:
+            return
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS games_game_fts USING fts5('
+            'title, subtitle, description, studios, tokenize = \'unicode61 remove_diacritics 2\')'
+        )
+        cursor.execute(
+            'INSERT INTO games_game_fts (rowid, title, subtitle, description, studios) '
+            'SELECT g.id, g.title, COALESCE(g.subtitle, \'\'), g.description, COALESCE(('
+            'SELECT group_concat(s.name, \' \') FROM games_developerandpublisher s WHERE s.id IN ('
+            'SELECT developerandpublisher_id FROM games_game_developer WHERE game_id = g.id '
+            'UNION ALL SELECT developerandpublisher_id FROM games_game_publisher WHERE game_id = g.id)), \'\') '
+            'FROM games_game g'
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS games_game_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0011_gameview_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
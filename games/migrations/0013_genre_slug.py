@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:40
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def fill_genre_slugs(apps, schema_editor):
+    Genre = apps.get_model('games', 'Genre')
+
+    taken = set()
+    for genre in Genre.objects.order_by('pk'):
+        base = slugify(genre.name) or 'genre'
+        slug, i = base, 1
+        while slug in taken:
+            i += 1
+            slug = f'{base}-{i}'
+        taken.add(slug)
+        genre.slug = slug
+        genre.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0012_game_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genre',
+            name='slug',
+            field=models.SlugField(max_length=100, null=True),
+        ),
+        migrations.RunPython(fill_genre_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='genre',
+            name='slug',
+            field=models.SlugField(max_length=100, unique=True),
+        ),
+        # Covers the genre -> games direction of the genre filter's EXISTS subqueries
+        migrations.RunSQL(
+            'CREATE INDEX games_game_genres_genre_game_idx ON games_game_genres (genre_id, game_id)',
+            'DROP INDEX games_game_genres_genre_game_idx',
+        ),
+    ]
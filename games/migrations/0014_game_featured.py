@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0013_genre_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='featured',
+            field=models.BooleanField(default=False, help_text='Always include this game in the featured rotation'),
+        ),
+    ]
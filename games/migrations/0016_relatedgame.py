@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0015_game_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedGame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_games', to='games.game')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_to', to='games.game')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['game', '-score'], name='related_game_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('game', 'other'), name='unique_related_game')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0016_relatedgame'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='neighbours_stale',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.CreateModel(
+            name='GameNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='games.game')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbour_of', to='games.game')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['game', '-similarity'], name='game_neighbour_similarity_idx')],
+                'constraints': [models.UniqueConstraint(fields=('game', 'other'), name='unique_game_neighbour')],
+            },
+        ),
+    ]
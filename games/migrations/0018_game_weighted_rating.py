@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def fill_rankings(apps, schema_editor):
+    Game = apps.get_model('games', 'Game')
+    quote = schema_editor.connection.ops.quote_name
+
+    totals = Game.objects.aggregate(reviews=Sum('review_count'), scores=Sum('score_sum'))
+    mean = totals['scores'] / totals['reviews'] if totals['reviews'] else 5.0
+    weight = getattr(settings, 'RATING_PRIOR_REVIEWS', 10)
+    Game.objects.update(weighted_rating=(F('score_sum') + mean * weight) / (F('review_count') + weight))
+    schema_editor.execute(
+        'UPDATE {table} SET {rank} = ranked.position '
+        'FROM (SELECT {pk}, ROW_NUMBER() OVER (ORDER BY {rating} DESC, {pk}) AS position FROM {table}) AS ranked '
+        'WHERE {table}.{pk} = ranked.{pk}'.format(
+            table=quote(Game._meta.db_table), pk=quote('id'), rank=quote('rank'), rating=quote('weighted_rating'),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0017_game_neighbours'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='rank',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='weighted_rating',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['weighted_rating'], name='game_weighted_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['rank'], name='game_rank_idx'),
+        ),
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
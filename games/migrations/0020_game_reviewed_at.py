@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:31
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def fill_reviewed_at(apps, schema_editor):
+    Game = apps.get_model('games', 'Game')
+    GameReview = apps.get_model('games', 'GameReview')
+
+    latest = GameReview.objects.filter(game=OuterRef('pk')).order_by().values('game').annotate(v=Max('created_at')).values('v')
+    Game.objects.update(reviewed_at=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0019_game_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_reviewed_at, migrations.RunPython.noop),
+    ]
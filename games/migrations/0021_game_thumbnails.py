@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0020_game_reviewed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
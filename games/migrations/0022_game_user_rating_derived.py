@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:52
+
+import games.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0021_game_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='game',
+            name='user_rating',
+            field=models.FloatField(default=0, editable=False, validators=[games.validators.MinMaxValidator(0, 10)]),
+        ),
+    ]
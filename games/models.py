@@ -1,9 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Now
 from django.urls import reverse
+from django.utils.text import slugify
 from django.utils.choices import BlankChoiceIterator
 
+from .images import thumbnail
 from .validators import LengthRangeValidator, MinMaxValidator
 
 User = get_user_model()
@@ -19,12 +23,34 @@ class DeveloperAndPublisher(models.Model):
         return str(self.name)
 
 
+def unique_slug(base, taken):
+    # base, or base-2, base-3... whichever taken(slug) is false for first
+    slug, suffix = base, 1
+    while taken(slug):
+        suffix += 1
+        slug = f'{base}-{suffix}'
+    return slug
+
+
+def pk_in_range(model, pk):
+    # Whether pk fits the primary key column, which __in lookups don't check before the database overflows
+    low, high = connection.ops.integer_field_range(model._meta.pk.get_internal_type())
+    return (low is None or pk >= low) and (high is None or pk <= high)
+
+
 class Genre(models.Model):
     name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True)
 
     def __str__(self):
         return str(self.name)
 
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            others = Genre.objects.exclude(pk=self.pk)
+            self.slug = unique_slug(slugify(self.name) or 'genre', lambda slug: others.filter(slug=slug).exists())
+        super().save(*args, **kwargs)
+
 class Platform(models.Model):
     company = models.ManyToManyField(DeveloperAndPublisher, related_name='released_consoles')
     name = models.CharField(max_length=250)
@@ -33,6 +59,57 @@ class Platform(models.Model):
         return str(self.name)
 
 
+def weighted_rating(review_count, score_sum, prior):
+    # Bayesian average: the game's mean score pulled towards the prior mean, less so the more reviews it has
+    mean, weight = prior
+    return (score_sum + mean * weight) / (review_count + weight)
+
+
+class GameQuerySet(models.QuerySet):
+    def with_card_data(self):
+        return self.prefetch_related('genres')
+
+    def with_detail_data(self):
+        return self.with_card_data().prefetch_related('developer', 'publisher', 'platforms')
+
+    def with_genres(self, genre_ids, match_all=False):
+        # EXISTS on the through table rather than a join, so no DISTINCT is needed
+        through = Game.genres.through.objects.filter(game=OuterRef('pk'))
+        if not match_all:
+            return self.filter(Exists(through.filter(genre_id__in=genre_ids)))
+        for genre_id in genre_ids:
+            self = self.filter(Exists(through.filter(genre_id=genre_id)))
+        return self
+
+    def apply_review_delta(self, count=0, score=0, recommend=0, prior=None):
+        # Both sides of the UPDATE see the old row, so the new averages are spelled out
+        review_count = F('review_count') + count
+        score_sum = F('score_sum') + score
+        fields = {
+            'review_count': review_count,
+            'score_sum': score_sum,
+            'recommend_count': F('recommend_count') + recommend,
+            # Back to 0 once the last review is gone
+            'user_rating': Case(When(Q(review_count__gt=-count), then=score_sum / review_count), default=Value(0.0)),
+            'neighbours_stale': True,
+            'updated_at': Now(),
+        }
+        if prior is not None:
+            fields['weighted_rating'] = weighted_rating(review_count, score_sum, prior)
+        return self.update(**fields)
+
+    def rebuild_review_stats(self):
+        reviews = GameReview.objects.filter(game=OuterRef('pk')).order_by().values('game')
+        updated = self.update(
+            review_count=Coalesce(Subquery(reviews.annotate(v=Count('pk')).values('v')), 0),
+            score_sum=Coalesce(Subquery(reviews.annotate(v=Sum('score')).values('v')), 0.0),
+            recommend_count=Coalesce(Subquery(reviews.annotate(v=Count('pk', filter=Q(recommend=True))).values('v')), 0),
+            updated_at=Now(),
+        )
+        self.update(user_rating=Case(When(review_count__gt=0, then=F('score_sum') / F('review_count')), default=Value(0.0)))
+        return updated
+
+
 class Game(models.Model):
     title = models.CharField(max_length=250)
     subtitle = models.CharField(max_length=250, null=True, blank=True)
@@ -40,7 +117,7 @@ class Game(models.Model):
     publisher = models.ManyToManyField(DeveloperAndPublisher, related_name='released_games')
     developer = models.ManyToManyField(DeveloperAndPublisher, related_name='published_games')
     rating = models.FloatField(validators=[MinMaxValidator(0, 10)])
-    user_rating = models.FloatField(validators=[MinMaxValidator(0, 10)])
+    user_rating = models.FloatField(default=0, editable=False, validators=[MinMaxValidator(0, 10)])
     cover = models.ImageField(upload_to='%Y/%m/cover')
     banner = models.ImageField(upload_to='%Y/%m/banner', null=True, blank=True)
     release_date = models.DateField()
@@ -50,9 +127,37 @@ class Game(models.Model):
     total_views = models.PositiveBigIntegerField(default=0, blank=True)
     monthly_views = models.PositiveBigIntegerField(default=0, blank=True)
     weekly_views = models.PositiveBigIntegerField(default=0, blank=True)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    score_sum = models.FloatField(default=0, editable=False)
+    recommend_count = models.PositiveIntegerField(default=0, editable=False)
     platforms = models.ManyToManyField(Platform, related_name='supporteded_games')
     online = models.BooleanField(default=False)
     offline = models.BooleanField(default=False)
+    featured = models.BooleanField(default=False, help_text='Always include this game in the featured rotation')
+    weighted_rating = models.FloatField(default=0, editable=False)
+    rank = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    neighbours_stale = models.BooleanField(default=True, editable=False)
+    # Also moved by the bulk updates of anything shown on game cards, which key their cached fragments on it
+    updated_at = models.DateTimeField(auto_now=True)
+    reviewed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Name of the cover and banner files the current thumbnails were made from, see games.images
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = GameQuerySet.as_manager()
+
+    class Meta:
+        # One per home page section and game list ordering, see check_query_plans
+        indexes = [
+            models.Index(fields=['weekly_views', 'user_rating'], name='game_trending_idx'),
+            models.Index(fields=['monthly_views', 'total_views'], name='game_most_viewed_idx'),
+            models.Index(fields=['total_views'], name='game_total_views_idx'),
+            models.Index(fields=['user_rating'], name='game_user_rating_idx'),
+            models.Index(fields=['weighted_rating'], name='game_weighted_rating_idx'),
+            models.Index(fields=['rank'], name='game_rank_idx'),
+            models.Index(fields=['rating'], name='game_rating_idx'),
+            models.Index(fields=['release_date'], name='game_release_date_idx'),
+            models.Index(fields=['title'], name='game_title_idx'),
+        ]
 
     def __str__(self):
         return str(self.title)
@@ -60,6 +165,18 @@ class Game(models.Model):
     def get_absolute_url(self):
         return reverse('game_details', args=[str(self.id)])
 
+    @property
+    def cover_thumb(self):
+        return thumbnail(self.cover, 'thumb', self.thumbnails.get('cover'))
+
+    @property
+    def banner_thumb(self):
+        return thumbnail(self.banner, 'thumb', self.thumbnails.get('banner'))
+
+    @property
+    def banner_hero(self):
+        return thumbnail(self.banner, 'hero', self.thumbnails.get('banner'))
+
 
 class GameReview(models.Model):
     class Status(models.IntegerChoices):
@@ -77,9 +194,76 @@ class GameReview(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     platforms = models.ManyToManyField(Platform, related_name='related_reviews')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_stats = instance.stats()
+        return instance
+
     def __str__(self):
         return str(self.author) + '\'s review on ' + str(self.game)
 
+    def stats(self):
+        # What this review contributes to the aggregates stored on its game
+        return self.game_id, self.score, int(self.recommend)
+
 class GameView(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='game_views')
     game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='views')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'game'], name='unique_game_view'),
+        ]
+
+class GameViewBucket(models.Model):
+    class Span(models.IntegerChoices):
+        DAY = 1, 'Day'
+        MONTH = 2, 'Month'
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='view_buckets')
+    day = models.DateField()
+    span = models.PositiveSmallIntegerField(choices=Span.choices, default=Span.DAY)
+    count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'day', 'span'], name='unique_game_view_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['span', 'day'], name='game_view_bucket_span_day'),
+        ]
+
+    def __str__(self):
+        return f'{self.game} - {self.day} ({self.get_span_display()})'
+
+class RelatedGame(models.Model):
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='related_games')
+    other = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='related_to')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'other'], name='unique_related_game'),
+        ]
+        indexes = [
+            models.Index(fields=['game', '-score'], name='related_game_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.game} -> {self.other} ({self.score:.3f})'
+
+class GameNeighbour(models.Model):
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='neighbours')
+    other = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='neighbour_of')
+    similarity = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'other'], name='unique_game_neighbour'),
+        ]
+        indexes = [
+            models.Index(fields=['game', '-similarity'], name='game_neighbour_similarity_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.game} -> {self.other} ({self.similarity:.3f})'
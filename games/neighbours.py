@@ -0,0 +1,102 @@
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+
+from .models import Game, GameNeighbour, GameReview
+from .related import replace_rows
+
+# Similarities of games few players reviewed together are shrunk towards 0 by n / (n + SHRINKAGE)
+SHRINKAGE = 5
+
+
+def rating_matrix(ids):
+    """
+    Sparse users x games matrix of review scores, each centred on the mean
+    score of its author, plus the matching matrix of 1s. Columns are in the
+    order of ids.
+    """
+    position = {pk: i for i, pk in enumerate(ids)}
+    reviews = np.array(list(GameReview.objects.values_list('author_id', 'game_id', 'score')), dtype=np.float64).reshape(-1, 3)
+    authors, rows = np.unique(reviews[:, 0], return_inverse=True)
+    cols = np.array([position[int(pk)] for pk in reviews[:, 1]], dtype=np.int64)
+    shape = (len(authors), len(ids))
+
+    # A player reviewing a game twice counts with their average score
+    reviewed = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=shape)
+    scores = sparse.csr_matrix((reviews[:, 2], (rows, cols)), shape=shape)
+    scores.data /= reviewed.data
+    reviewed.data[:] = 1
+
+    means = np.asarray(scores.sum(axis=1)).ravel() / np.maximum(reviewed.getnnz(axis=1), 1)
+    centred = scores.copy()
+    centred.data -= np.repeat(means, np.diff(centred.indptr))
+    return centred, reviewed
+
+
+def neighbour_scores(ids, targets, centred, reviewed, top_k=20, chunk_size=500):
+    """
+    Yield (game ids, [(game id, other game id, similarity), ...]) for every
+    chunk_size of the games at the targets column positions, holding their
+    top_k neighbours by adjusted cosine similarity of their review scores
+    (see rating_matrix). Working a chunk at a time keeps memory bounded.
+    """
+    norms = np.sqrt(np.asarray(centred.multiply(centred).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalized = centred.dot(sparse.diags(1 / norms)).tocsr()
+    normalized_columns, reviewed_columns = normalized.tocsc(), reviewed.tocsc()
+
+    for start in range(0, len(targets), chunk_size):
+        chunk = targets[start:start + chunk_size]
+        similarity = (normalized_columns[:, chunk].T @ normalized).tocsr()
+        together = (reviewed_columns[:, chunk].T @ reviewed).tocsr()
+        together.data = together.data / (together.data + SHRINKAGE)
+        similarity = similarity.multiply(together).tocsr()
+        rows = []
+        for row, game in enumerate(chunk):
+            begin, end = similarity.indptr[row], similarity.indptr[row + 1]
+            cols, data = similarity.indices[begin:end], similarity.data[begin:end]
+            keep = (cols != game) & (data > 0)
+            cols, data = cols[keep], data[keep]
+            if len(data) > top_k:
+                best = np.argpartition(-data, top_k)[:top_k]
+                cols, data = cols[best], data[best]
+            rows.extend((ids[game], ids[col], value) for col, value in zip(cols.tolist(), data.tolist()))
+        yield [ids[game] for game in chunk], rows
+
+
+def refresh_neighbours(top_k=20, chunk_size=500, full=False):
+    """
+    Recompute the stored neighbours of every game (full) or only of those
+    whose similarities may have moved since the last run: games whose
+    reviews changed and every game reviewed by the same players. Returns
+    the number of games refreshed.
+
+    Games are marked fresh before their scores are read, so reviews posted
+    during the run mark them again. Each chunk of games is swapped in with
+    a transaction of its own, never holding the database for the whole run.
+    """
+    with transaction.atomic():
+        ids = list(Game.objects.order_by('pk').values_list('pk', flat=True))
+        stale = Game.objects.all() if full else Game.objects.filter(neighbours_stale=True)
+        stale_ids = set(stale.values_list('pk', flat=True))
+        stale.update(neighbours_stale=False)
+    if not stale_ids:
+        return 0
+
+    try:
+        centred, reviewed = rating_matrix(ids)
+        if full:
+            targets = np.arange(len(ids))
+        else:
+            changed = np.array([i for i, pk in enumerate(ids) if pk in stale_ids])
+            players = np.unique(reviewed.tocsc()[:, changed].nonzero()[0])
+            targets = np.union1d(changed, np.unique(reviewed[players].nonzero()[1])).astype(np.int64)
+
+        for game_ids, rows in neighbour_scores(ids, targets, centred, reviewed, top_k, chunk_size):
+            replace_rows(GameNeighbour, 'similarity', game_ids, rows)
+    except Exception:
+        # Left for the next run
+        Game.objects.filter(pk__in=stale_ids).update(neighbours_stale=True)
+        raise
+    return len(targets)
@@ -0,0 +1,190 @@
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Ties broken like the matching home page section, so both read the same index
+TIEBREAKERS = {
+    'weekly_views': ('user_rating',),
+    'monthly_views': ('total_views',),
+}
+
+# Columns the game list can be ordered by, every one of them ending in the primary key
+ORDERINGS = {
+    '': ('pk',),
+    **{f'{sign}{field}': tuple(f'{sign}{name}' for name in (field, *TIEBREAKERS.get(field, ()), 'pk'))
+       for field in ('release_date', 'rating', 'user_rating', 'weighted_rating', 'weekly_views', 'monthly_views', 'total_views', 'title')
+       for sign in ('', '-')},
+}
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator that keeps the COUNT(*) of a queryset in the cache for
+    PAGINATION_COUNT_TTL seconds instead of running it on every page.
+    """
+
+    @cached_property
+    def cache_key(self):
+        try:
+            return 'paginator_count:' + hashlib.md5(str(self.object_list.query).encode()).hexdigest()
+        except EmptyResultSet:
+            return None
+
+    @cached_property
+    def count(self):
+        if self.cache_key is None:
+            return super().count
+        count = cache.get(self.cache_key)
+        if count is None:
+            count = super().count
+            cache.set(self.cache_key, count, getattr(settings, 'PAGINATION_COUNT_TTL', 300))
+        return count
+
+    async def aget_page(self, number):
+        # get_page() for async views, counting and fetching the page without blocking
+        if 'count' not in self.__dict__:
+            count = await cache.aget(self.cache_key) if self.cache_key else None
+            if count is None:
+                count = await self.object_list.acount()
+                if self.cache_key:
+                    await cache.aset(self.cache_key, count, getattr(settings, 'PAGINATION_COUNT_TTL', 300))
+            self.__dict__['count'] = count
+        page = self.get_page(number)
+        page.object_list = [obj async for obj in page.object_list]
+        return page
+
+    def cached_count(self):
+        # The count if some earlier request already paid for it, None otherwise
+        return cache.get(self.cache_key) if self.cache_key else None
+
+
+def encode_cursor(values, ordering, backwards=False):
+    data = json.dumps({'v': values, 'o': list(ordering), 'b': backwards}, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    # (values, ordering, backwards) as encoded, checked with clean_cursor before it is used
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return list(data['v']), list(data['o']), bool(data['b'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def clean_cursor(cursor, model, ordering, annotations=None):
+    """
+    The (values, backwards) of a decoded cursor, each value converted to the
+    type of its ordering column, or None unless the cursor was made for this
+    ordering and holds one plain value per column. Columns that are not
+    fields of model are looked up in annotations, {name: output field}.
+    """
+    if cursor is None:
+        return None
+    values, cursor_ordering, backwards = cursor
+    if cursor_ordering != list(ordering) or len(values) != len(ordering):
+        return None
+    try:
+        cleaned = []
+        for field, value in zip(ordering, values):
+            if not isinstance(value, (str, int, float)):
+                return None
+            name = field.lstrip('-')
+            if name in (annotations or {}):
+                column = annotations[name]
+            else:
+                column = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            cleaned.append(column.to_python(value))
+    except (ValidationError, TypeError, ValueError, FieldDoesNotExist):
+        return None
+    return cleaned, backwards
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, prev_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _seek(ordering, values, backwards):
+    # (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y), per column direction
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        after = field.startswith('-') == backwards
+        condition |= equal & Q(**{f'{name}__{"gt" if after else "lt"}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def cursor_for(obj, ordering, backwards=False):
+    # obj is a model instance, or a dict of values() that include the ordering columns
+    get = obj.get if isinstance(obj, dict) else lambda name: getattr(obj, name)
+    return encode_cursor([get(field.lstrip('-')) for field in ordering], ordering, backwards)
+
+
+def _keyset_query(queryset, ordering, per_page, cursor):
+    values, backwards = cursor or (None, False)
+    qs = queryset.order_by(*ordering)
+    if values is not None:
+        qs = qs.filter(_seek(ordering, values, backwards))
+    if backwards:
+        qs = qs.reverse()
+    return qs[:per_page + 1]
+
+
+def _keyset_result(rows, ordering, per_page, cursor):
+    values, backwards = cursor or (None, False)
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows, None, None)
+
+    has_next = more if not backwards else True
+    has_prev = more if backwards else values is not None
+    return KeysetPage(
+        rows,
+        cursor_for(rows[-1], ordering) if has_next else None,
+        cursor_for(rows[0], ordering, backwards=True) if has_prev else None,
+    )
+
+
+def keyset_page(queryset, ordering, per_page, cursor=None):
+    """
+    Fetch one page of queryset, ordered by ordering, starting after (or, for
+    backwards cursors, before) the row the cursor was made from. Costs the same
+    at any depth since it never uses OFFSET.
+    """
+    rows = list(_keyset_query(queryset, ordering, per_page, cursor))
+    return _keyset_result(rows, ordering, per_page, cursor)
+
+
+async def akeyset_page(queryset, ordering, per_page, cursor=None):
+    rows = [obj async for obj in _keyset_query(queryset, ordering, per_page, cursor)]
+    return _keyset_result(rows, ordering, per_page, cursor)
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from .models import Game, weighted_rating
+
+RANK_SQL = '''
+UPDATE {table} SET {rank} = ranked.position
+FROM (SELECT {pk}, ROW_NUMBER() OVER (ORDER BY {rating} DESC, {pk}) AS position FROM {table}) AS ranked
+WHERE {table}.{pk} = ranked.{pk}
+'''
+
+
+def refresh_rating_prior():
+    totals = Game.objects.aggregate(reviews=Sum('review_count'), scores=Sum('score_sum'))
+    mean = totals['scores'] / totals['reviews'] if totals['reviews'] else 5.0
+    cache.set('rating_prior', mean, getattr(settings, 'RATING_PRIOR_TTL', 3600))
+    return mean
+
+
+def rating_prior():
+    """
+    The (mean, weight) every game's reviews are averaged with: the mean score
+    of all reviews, counted as RATING_PRIOR_REVIEWS reviews. The mean is
+    worked out again every RATING_PRIOR_TTL seconds and by rebuild_rankings.
+    """
+    mean = cache.get('rating_prior')
+    if mean is None:
+        mean = refresh_rating_prior()
+    return mean, getattr(settings, 'RATING_PRIOR_REVIEWS', 10)
+
+
+def remove_rank(rank):
+    # Close the gap left by a deleted game
+    if rank is not None:
+        Game.objects.filter(rank__gt=rank).update(rank=F('rank') - 1)
+
+
+def rebuild_rankings():
+    """
+    Recompute the prior, then every weighted rating and every rank, one
+    statement each. Returns the number of games ranked.
+
+    Reviews only move the weighted rating of their game; ranks catch up
+    here, as moving one game would shift every game it passes.
+    """
+    refresh_rating_prior()
+    prior = rating_prior()
+    quote = connection.ops.quote_name
+    with transaction.atomic():
+        ranked = Game.objects.update(weighted_rating=weighted_rating(F('review_count'), F('score_sum'), prior))
+        with connection.cursor() as cursor:
+            cursor.execute(RANK_SQL.format(
+                table=quote(Game._meta.db_table),
+                pk=quote(Game._meta.pk.column),
+                rank=quote('rank'),
+                rating=quote('weighted_rating'),
+            ))
+    return ranked
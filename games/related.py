@@ -0,0 +1,117 @@
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+
+from .models import Game, GameReview, GameView, RelatedGame
+
+# How much each signal counts towards the score of a related game, and how it is compared
+SIGNALS = {
+    'genres': (1.0, 'jaccard'),
+    'developers': (0.6, 'jaccard'),
+    'platforms': (0.2, 'jaccard'),
+    'reviewers': (1.0, 'cosine'),
+    'viewers': (0.5, 'cosine'),
+}
+
+
+def signal_pairs():
+    # (game id, feature id) pairs of every signal
+    return {
+        'genres': Game.genres.through.objects.values_list('game_id', 'genre_id'),
+        'developers': Game.developer.through.objects.values_list('game_id', 'developerandpublisher_id'),
+        'platforms': Game.platforms.through.objects.values_list('game_id', 'platform_id'),
+        'reviewers': GameReview.objects.values_list('game_id', 'author_id'),
+        'viewers': GameView.objects.values_list('game_id', 'user_id'),
+    }
+
+
+def incidence_matrix(pairs, position):
+    """
+    Sparse games x features matrix with a 1 where the game has the feature,
+    rows in the order of position ({game id: row}).
+    """
+    pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+    rows = np.array([position[pk] for pk in pairs[:, 0]], dtype=np.int64)
+    features, cols = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(position), len(features)))
+    matrix.data[:] = 1 # Duplicate pairs count once
+    return matrix
+
+
+def _similarity(chunk, matrix, kind, sizes, start):
+    # Similarity of the chunk's games to every game, as a sparse matrix
+    overlap = (chunk @ matrix.T).tocoo()
+    if kind == 'cosine':
+        return overlap
+    rows = overlap.row + start
+    overlap.data = overlap.data / (sizes[rows] + sizes[overlap.col] - overlap.data)
+    return overlap
+
+
+def related_scores(top_k=10, chunk_size=500):
+    """
+    Yield (game ids, [(game id, other game id, score), ...]) for every
+    chunk_size games, holding the top_k games related to each of them, scored
+    by the weighted similarity of their SIGNALS. Working a chunk at a time
+    keeps memory bounded.
+    """
+    ids = np.array(list(Game.objects.order_by('pk').values_list('pk', flat=True)), dtype=np.int64)
+    position = {pk: i for i, pk in enumerate(ids.tolist())}
+    pairs = signal_pairs()
+
+    matrices = []
+    for name, (weight, kind) in SIGNALS.items():
+        matrix = incidence_matrix(pairs[name], position)
+        sizes = np.asarray(matrix.sum(axis=1)).ravel()
+        if kind == 'cosine':
+            norms = np.sqrt(sizes)
+            norms[norms == 0] = 1
+            matrix = sparse.diags(1 / norms).dot(matrix).tocsr()
+        matrices.append((weight, kind, matrix, sizes))
+
+    for start in range(0, len(ids), chunk_size):
+        stop = min(start + chunk_size, len(ids))
+        scores = sparse.csr_matrix((stop - start, len(ids)), dtype=np.float32)
+        for weight, kind, matrix, sizes in matrices:
+            scores = scores + weight * _similarity(matrix[start:stop], matrix, kind, sizes, start).tocsr()
+
+        scores = scores.tocoo()
+        keep = (scores.col != scores.row + start) & (scores.data > 0) # A game is not related to itself
+        scores = sparse.csr_matrix((scores.data[keep], (scores.row[keep], scores.col[keep])), shape=scores.shape)
+
+        rows = []
+        for row in range(stop - start):
+            begin, end = scores.indptr[row], scores.indptr[row + 1]
+            cols, data = scores.indices[begin:end], scores.data[begin:end]
+            if len(data) > top_k:
+                best = np.argpartition(-data, top_k)[:top_k]
+                cols, data = cols[best], data[best]
+            rows.extend((int(ids[start + row]), int(ids[col]), score) for col, score in zip(cols.tolist(), data.tolist()))
+        yield ids[start:stop].tolist(), rows
+
+
+def replace_rows(model, value_field, game_ids, rows):
+    """
+    Swap the rows of model stored for game_ids for rows of (game id, other
+    game id, value_field) in one short transaction, skipping rows of games
+    deleted since they were scored. Returns the number of rows written.
+    """
+    with transaction.atomic():
+        model.objects.filter(game_id__in=game_ids).delete()
+        existing = set(Game.objects.filter(pk__in={pk for row in rows for pk in row[:2]}).values_list('pk', flat=True))
+        return len(model.objects.bulk_create(
+            model(game_id=game_id, other_id=other_id, **{value_field: value})
+            for game_id, other_id, value in rows
+            if game_id in existing and other_id in existing
+        ))
+
+
+def rebuild_related_games(top_k=10, chunk_size=500):
+    """
+    Replace the related games of every game with freshly computed scores.
+    Each chunk is scored before its rows are swapped in with a transaction
+    of its own, so the database is never locked for the whole run. Returns
+    the number of rows written.
+    """
+    return sum(replace_rows(RelatedGame, 'score', game_ids, rows) for game_ids, rows in related_scores(top_k, chunk_size))
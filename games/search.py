@@ -0,0 +1,115 @@
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Value, When
+
+from .models import Game
+
+FTS_TABLE = 'games_game_fts'
+
+# Column weights for bm25(): title, subtitle, description, studios
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+
+_available = {}
+
+# Position of each FTS match in search_games() results, best first
+SEARCH_RANK_FIELDS = {'search_rank': IntegerField()}
+
+
+def fts_available(using='default'):
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _available[using]
+
+
+def match_expression(query):
+    # Every word has to match, the last one as a prefix so type-ahead works
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return ''
+    return ' '.join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*'])
+
+
+def _index_rows(game_ids):
+    studios = {}
+    for through in (Game.developer.through, Game.publisher.through):
+        for game_id, name in through.objects.filter(game_id__in=game_ids).values_list('game_id', 'developerandpublisher__name'):
+            studios.setdefault(game_id, []).append(name)
+
+    for pk, title, subtitle, description in Game.objects.filter(pk__in=game_ids).values_list('pk', 'title', 'subtitle', 'description'):
+        yield pk, title, subtitle or '', description, ' '.join(studios.get(pk, []))
+
+
+def remove_games(game_ids, using='default'):
+    if not game_ids or not fts_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in game_ids])
+
+
+def index_games(game_ids, using='default'):
+    game_ids = list(game_ids)
+    if not game_ids or not fts_available(using):
+        return
+    remove_games(game_ids, using)
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, subtitle, description, studios) VALUES (%s, %s, %s, %s, %s)',
+            list(_index_rows(game_ids)),
+        )
+
+
+def rebuild_index(batch_size=1000, using='default'):
+    if not fts_available(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    indexed = 0
+    last_id = 0
+    ids = Game.objects.order_by('pk').values_list('pk', flat=True)
+    while batch := list(ids.filter(pk__gt=last_id)[:batch_size]):
+        index_games(batch, using)
+        indexed += len(batch)
+        last_id = batch[-1]
+    return indexed
+
+
+def ranked_ids(query, limit=None, using='default'):
+    expression = match_expression(query)
+    if not expression:
+        return []
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+            [expression, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_ordering(using='default'):
+    # The order search_games() gives its matches in, ending in the primary key so keyset pages can follow it
+    return ('search_rank', 'pk') if fts_available(using) else ('title', 'pk')
+
+
+def search_games(queryset, query):
+    """
+    Filter a Game queryset down to the matches for query, best match first.
+
+    Uses the FTS5 index when the database has one, and falls back to substring
+    matching on the title, subtitle and studio names otherwise.
+    """
+    if fts_available(queryset.db):
+        ids = ranked_ids(query, using=queryset.db)
+        rank = Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(ids)], output_field=IntegerField())
+        return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by('search_rank')
+
+    studios = Game.developer.through.objects.filter(game=OuterRef('pk'), developerandpublisher__name__icontains=query)
+    publishers = Game.publisher.through.objects.filter(game=OuterRef('pk'), developerandpublisher__name__icontains=query)
+    return queryset.filter(
+        Q(title__icontains=query) | Q(subtitle__icontains=query) | Exists(studios) | Exists(publishers)
+    ).order_by('title')
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Game
+
+# Home page sections: how each is ordered or filtered, and how many games it shows
+SECTIONS = {
+    'trending': (lambda games: games.order_by('-weekly_views', '-user_rating'), 6),
+    'popular': (lambda games: games.order_by('-weighted_rating'), 6),
+    'most_viewed': (lambda games: games.order_by('-monthly_views', '-total_views'), 6),
+    'new': (lambda games: games.order_by('-release_date'), 6),
+    'carousel': (lambda games: games.filter(rating__gt=9.5, user_rating__gt=9), 3),
+}
+
+
+def catalog_version():
+    return cache.get_or_set('catalog_version', 1, None)
+
+
+async def acatalog_version():
+    return await cache.aget_or_set('catalog_version', 1, None)
+
+
+def bump_catalog_version():
+    """
+    Invalidate everything cached from the catalog by moving on to new cache
+    keys. Old entries are left to expire.
+    """
+    try:
+        cache.incr('catalog_version')
+    except ValueError:
+        cache.set('catalog_version', 2, None)
+
+
+def views_bucket():
+    """
+    Number of the SECTION_CACHE_TTL long span of time it is. View counts are
+    flushed without moving the catalog version, so what is ordered by them
+    goes by this instead.
+    """
+    return int(time.time() // getattr(settings, 'SECTION_CACHE_TTL', 300))
+
+
+def recommendations_version():
+    return cache.get_or_set('recommendations_version', 1, None)
+
+
+async def arecommendations_version():
+    return await cache.aget_or_set('recommendations_version', 1, None)
+
+
+def bump_recommendations_version():
+    # Moved on by the commands storing related games and neighbours, which no game save does
+    try:
+        cache.incr('recommendations_version')
+    except ValueError:
+        cache.set('recommendations_version', 2, None)
+
+
+def section_queryset(name):
+    build, size = SECTIONS[name]
+    return build(Game.objects.all())[:size]
+
+
+def section_ids(names):
+    version = catalog_version()
+    keys = {name: f'home_section:{version}:{name}' for name in names}
+    cached = cache.get_many(keys.values())
+
+    ids = {}
+    missing = {}
+    for name, key in keys.items():
+        if key in cached:
+            ids[name] = cached[key]
+        else:
+            ids[name] = missing[key] = list(section_queryset(name).values_list('pk', flat=True))
+    if missing:
+        cache.set_many(missing, getattr(settings, 'SECTION_CACHE_TTL', 300))
+    return ids
+
+
+def get_sections(names=tuple(SECTIONS), extra=None):
+    """
+    Games of each home page section, as {name: [game, ...]}. The ids come from
+    the cache, and every game, including those of the extra {name: ids}
+    sections, is loaded with a single in_bulk() query.
+    """
+    ids = section_ids(names) | (extra or {})
+    games = Game.objects.with_card_data().in_bulk({pk for section in ids.values() for pk in section})
+    return {name: [games[pk] for pk in section if pk in games] for name, section in ids.items()}
+
+
+async def asection_ids(names):
+    # section_ids() for async views, with the sections missing from the cache queried side by side
+    version = await acatalog_version()
+    keys = {name: f'home_section:{version}:{name}' for name in names}
+    cached = await cache.aget_many(keys.values())
+
+    async def load(name):
+        return [pk async for pk in section_queryset(name).values_list('pk', flat=True)]
+
+    missing = [name for name, key in keys.items() if key not in cached]
+    loaded = dict(zip(missing, await asyncio.gather(*(load(name) for name in missing))))
+    if loaded:
+        await cache.aset_many({keys[name]: ids for name, ids in loaded.items()}, getattr(settings, 'SECTION_CACHE_TTL', 300))
+    return {name: cached[key] if key in cached else loaded[name] for name, key in keys.items()}
+
+
+async def aget_sections(names=tuple(SECTIONS), extra=None):
+    ids = await asection_ids(names) | (extra or {})
+    games = await Game.objects.with_card_data().ain_bulk({pk for section in ids.values() for pk in section})
+    return {name: [games[pk] for pk in section if pk in games] for name, section in ids.items()}
@@ -0,0 +1,149 @@
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import featured, images, ranking, search, sections, suggest
+from .models import DeveloperAndPublisher, Game, GameReview, Genre, Platform
+
+
+def apply_review_delta(game_id, count, score, recommend):
+    Game.objects.filter(pk=game_id).apply_review_delta(count, score, recommend, ranking.rating_prior())
+
+
+@receiver(post_save, sender=GameReview)
+def update_review_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    game_id, score, recommend = instance.stats()
+    saved = None if created else getattr(instance, '_saved_stats', None)
+
+    if saved is None:
+        apply_review_delta(game_id, 1, score, recommend)
+    elif saved[0] != game_id:
+        apply_review_delta(saved[0], -1, -saved[1], -saved[2])
+        apply_review_delta(game_id, 1, score, recommend)
+    elif saved != (game_id, score, recommend):
+        apply_review_delta(game_id, 0, score - saved[1], recommend - saved[2])
+
+    instance._saved_stats = (game_id, score, recommend)
+    Game.objects.filter(pk=game_id).update(reviewed_at=Now())
+
+
+@receiver(post_delete, sender=GameReview)
+def update_review_stats_on_delete(sender, instance, origin=None, **kwargs):
+    # Nothing to keep up to date on a game that is being deleted along with its reviews
+    if not (isinstance(origin, Game) or getattr(origin, 'model', None) is Game):
+        game_id, score, recommend = getattr(instance, '_saved_stats', None) or instance.stats()
+        apply_review_delta(game_id, -1, -score, -recommend)
+        Game.objects.filter(pk=game_id).update(reviewed_at=Now())
+    # The author's mean score moved, and with it how their other games compare to each other
+    Game.objects.filter(reviews__author_id=instance.author_id).update(neighbours_stale=True)
+
+
+@receiver(post_save, sender=Game)
+def rate_game_on_create(sender, instance, created, raw=False, **kwargs):
+    # Ranked by the next rebuild_rankings
+    if created and not raw:
+        apply_review_delta(instance.pk, 0, 0, 0)
+
+
+@receiver(pre_delete, sender=Game)
+def read_rank_on_delete(sender, instance, **kwargs):
+    instance._saved_rank = Game.objects.filter(pk=instance.pk).values_list('rank', flat=True).first()
+
+
+@receiver(post_delete, sender=Game)
+def unrank_game_on_delete(sender, instance, **kwargs):
+    ranking.remove_rank(getattr(instance, '_saved_rank', instance.rank))
+
+
+@receiver(post_save, sender=Game)
+def index_game_on_save(sender, instance, raw=False, using='default', **kwargs):
+    if not raw:
+        search.index_games([instance.pk], using)
+        suggest.suggest_index.update(instance)
+        featured.featured_sampler.mark_stale()
+
+
+@receiver(post_save, sender=Game)
+def make_thumbnails_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    thumbnails = images.build_thumbnails(instance)
+    if thumbnails != instance.thumbnails:
+        # The save already moved updated_at, so cached cards pick the thumbnails up
+        instance.thumbnails = thumbnails
+        Game.objects.filter(pk=instance.pk).update(thumbnails=thumbnails)
+
+
+@receiver(post_delete, sender=Game)
+def unindex_game_on_delete(sender, instance, using='default', **kwargs):
+    search.remove_games([instance.pk], using)
+    suggest.suggest_index.remove(instance.pk)
+    featured.featured_sampler.mark_stale()
+
+
+# The through tables of each model games are related to
+RELATIONS = {
+    DeveloperAndPublisher: [Game.developer.through, Game.publisher.through],
+    Genre: [Game.genres.through],
+    Platform: [Game.platforms.through],
+}
+
+
+def touch_games(game_ids):
+    # Anything cached per game under its updated_at, or under the catalog version, is rendered again
+    Game.objects.filter(pk__in=game_ids).update(updated_at=Now())
+    sections.bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=Game.developer.through)
+@receiver(m2m_changed, sender=Game.publisher.through)
+@receiver(m2m_changed, sender=Game.genres.through)
+@receiver(m2m_changed, sender=Game.platforms.through)
+def update_games_on_relation_change(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    if not reverse:
+        game_ids = [instance.pk] if action.startswith('post_') else []
+    # Changed from the other side, pk_set holds games (except on clear)
+    elif action == 'pre_clear':
+        instance._cleared_games = list(sender.objects.filter(**{instance._meta.model_name: instance}).values_list('game_id', flat=True))
+        return
+    elif action == 'post_clear':
+        game_ids = getattr(instance, '_cleared_games', [])
+    elif action in ('post_add', 'post_remove'):
+        game_ids = pk_set
+    else:
+        return
+
+    touch_games(game_ids)
+    if sender in RELATIONS[DeveloperAndPublisher]:
+        search.index_games(game_ids, using)
+
+
+@receiver(post_save, sender=DeveloperAndPublisher)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Platform)
+@receiver(pre_delete, sender=DeveloperAndPublisher)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Platform)
+def update_games_on_related_change(sender, instance, signal, created=False, raw=False, using='default', **kwargs):
+    if raw or created:
+        return
+    game_ids = set()
+    for through in RELATIONS[sender]:
+        game_ids.update(through.objects.filter(**{sender._meta.model_name: instance}).values_list('game_id', flat=True))
+    touch_games(game_ids)
+    if sender is DeveloperAndPublisher and signal is post_save:
+        search.index_games(game_ids, using)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+@receiver(post_save, sender=GameReview)
+@receiver(post_delete, sender=GameReview)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_catalog_caches(sender, raw=False, **kwargs):
+    if not raw:
+        sections.bump_catalog_version()
@@ -0,0 +1,153 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from .models import Game
+
+# Prefixes up to this long have their best games worked out when the index is built,
+# their ranges are too long to rank on every keystroke
+SHORT_PREFIX_LENGTH = 3
+# Games kept for each of them, more than any suggestion list shows
+SHORT_PREFIX_TOP = 50
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+def rank(game):
+    # Most viewed first, then alphabetically, of a (title, subtitle, views) tuple
+    return -game[2], game[0]
+
+
+def short_prefixes(keys):
+    return {key[:n] for key in keys for n in range(1, min(len(key), SHORT_PREFIX_LENGTH) + 1)}
+
+
+def index_keys(title, subtitle):
+    # Every word start of the title and subtitle, so "zel" finds "The Legend of Zelda"
+    keys = set()
+    for text in (title, subtitle):
+        words = normalize(text).split()
+        keys.update(' '.join(words[i:]) for i in range(len(words)))
+    return keys
+
+
+class PrefixIndex:
+    """
+    Sorted array of (key, game id) pairs searched with bisect.
+
+    Built from the Game table on first use and every SUGGEST_INDEX_TTL seconds
+    after that, and updated in place when games are saved or deleted. Rebuilds
+    read the table without holding the lock and swap the new arrays in, so
+    suggestions keep coming from the old ones meanwhile.
+
+    Short prefixes match a large part of the index, so the SHORT_PREFIX_TOP
+    best games of each are kept ranked beside it. Games removed in place
+    leave those lists a little short until the next rebuild.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.building = threading.Lock()
+        self.entries = []
+        self.games = {}
+        self.top = {}
+        self.built_at = None
+
+    @property
+    def stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > getattr(settings, 'SUGGEST_INDEX_TTL', 600)
+
+    def build(self):
+        games = {}
+        keys = {}
+        entries = []
+        for pk, title, subtitle, views in Game.objects.values_list('pk', 'title', 'subtitle', 'total_views').iterator():
+            games[pk] = (title, subtitle, views)
+            keys[pk] = index_keys(title, subtitle)
+            entries.extend((key, pk) for key in keys[pk])
+        entries.sort()
+
+        # Going through the games best first, each short prefix takes the first ones that match it
+        top = {}
+        for pk in sorted(games, key=lambda pk: rank(games[pk])):
+            for prefix in short_prefixes(keys[pk]):
+                best = top.setdefault(prefix, [])
+                if len(best) < SHORT_PREFIX_TOP:
+                    best.append(pk)
+
+        with self.lock:
+            self.entries = entries
+            self.games = games
+            self.top = top
+            self.built_at = time.monotonic()
+
+    def refresh(self):
+        # One thread rebuilds, the others only wait for it when there is no index yet
+        if self.building.acquire(blocking=self.built_at is None):
+            try:
+                if self.stale:
+                    self.build()
+            finally:
+                self.building.release()
+
+    def remove(self, game_id):
+        with self.lock:
+            game = self.games.pop(game_id, None)
+            if game is None:
+                return
+            keys = index_keys(game[0], game[1])
+            for key in keys:
+                i = bisect_left(self.entries, (key, game_id))
+                if i < len(self.entries) and self.entries[i] == (key, game_id):
+                    del self.entries[i]
+            for prefix in short_prefixes(keys):
+                if game_id in self.top.get(prefix, ()):
+                    self.top[prefix].remove(game_id)
+
+    def update(self, game):
+        with self.lock:
+            if self.built_at is None:
+                return
+            self.remove(game.pk)
+            self.games[game.pk] = (game.title, game.subtitle, game.total_views)
+            keys = index_keys(game.title, game.subtitle)
+            for key in keys:
+                insort(self.entries, (key, game.pk))
+            for prefix in short_prefixes(keys):
+                best = self.top.setdefault(prefix, [])
+                insort(best, game.pk, key=lambda pk: rank(self.games[pk]))
+                del best[SHORT_PREFIX_TOP:]
+
+    def suggest(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if self.stale:
+            self.refresh()
+
+        with self.lock:
+            if len(prefix) <= SHORT_PREFIX_LENGTH and limit <= SHORT_PREFIX_TOP:
+                found = [(pk, self.games[pk]) for pk in self.top.get(prefix, [])[:limit]]
+            else:
+                # Longer prefixes match few enough entries to rank every one of them
+                start = bisect_left(self.entries, (prefix,))
+                stop = bisect_left(self.entries, (prefix + chr(0x10FFFF),), start)
+                found = [(pk, self.games[pk]) for pk in {pk for _, pk in self.entries[start:stop]}]
+        games = heapq.nsmallest(limit, found, key=lambda item: rank(item[1]))
+
+        return [{'id': pk, 'title': title, 'subtitle': subtitle} for pk, (title, subtitle, _) in games]
+
+
+suggest_index = PrefixIndex()
+
+
+def suggest_titles(prefix, limit=8):
+    return suggest_index.suggest(prefix, limit)
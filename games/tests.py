@@ -1,8 +1,37 @@
+import csv
+import gzip
+import importlib.util
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from PIL import Image
+
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.forms import modelform_factory
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
-from .models import DeveloperAndPublisher, Game, Genre, GameReview
+from .counters import ViewCounter, compact_view_buckets, flush_view_counts, refresh_view_windows
+from . import search
+from .catalog import CatalogImporter, game_rows, read_rows
+from .featured import FeaturedSampler
+from .images import variant_name
+from .ranking import rating_prior, rebuild_rankings, refresh_rating_prior
+from .sections import catalog_version
+from .management.commands.check_query_plans import full_scans
+from .models import DeveloperAndPublisher, Game, GameView, GameViewBucket, Genre, GameReview, Platform, RelatedGame
+from .suggest import PrefixIndex
+from .tracking import SeenSet, record_session_view, record_user_view
 
 
 class DeveloperAndPublisherModelTest(TestCase):
@@ -24,6 +53,15 @@ class GenreModelTest(TestCase):
         genre = Genre.objects.create(name="Action")
         self.assertEqual(str(genre), "Action")
 
+    def test_slug_from_name(self):
+        genre = Genre.objects.create(name="Role Playing")
+        self.assertEqual(genre.slug, "role-playing")
+
+    def test_slug_kept_unique(self):
+        Genre.objects.create(name="Sci-Fi")
+        self.assertEqual(Genre.objects.create(name="Sci Fi").slug, "sci-fi-2")
+        self.assertEqual(Genre.objects.create(name="!!").slug, "genre")
+
 
 class GameModelTest(TestCase):
 
@@ -36,12 +74,14 @@ class GameModelTest(TestCase):
         game = Game.objects.create(
             title="Test Game",
             description="A" * 150,
-            publisher=self.pub,
-            developer=self.dev,
+            user_rating=0,
+            gameplay_duration=10,
             rating=7.5,
             cover="covers/test.jpg",
             release_date="2024-01-01",
         )
+        game.publisher.add(self.pub)
+        game.developer.add(self.dev)
         game.genres.add(self.genre)
         self.assertEqual(str(game), "Test Game")
 
@@ -49,8 +89,8 @@ class GameModelTest(TestCase):
         game = Game(
             title="Short Desc Game",
             description="Too short",
-            publisher=self.pub,
-            developer=self.dev,
+            user_rating=0,
+            gameplay_duration=10,
             rating=5,
             cover="covers/test.jpg",
             release_date="2024-01-01",
@@ -62,8 +102,8 @@ class GameModelTest(TestCase):
         game = Game(
             title="Invalid Rating Game",
             description="Valid description " * 10,
-            publisher=self.pub,
-            developer=self.dev,
+            user_rating=0,
+            gameplay_duration=10,
             rating=15,
             cover="covers/test.jpg",
             release_date="2024-01-01",
@@ -75,8 +115,8 @@ class GameModelTest(TestCase):
         game = Game(
             title="Valid Game",
             description="Valid description " * 10,
-            publisher=self.pub,
-            developer=self.dev,
+            user_rating=0,
+            gameplay_duration=10,
             rating=8.5,
             cover="covers/test.jpg",
             release_date="2024-01-01",
@@ -96,12 +136,14 @@ class GameReviewModelTest(TestCase):
         self.game = Game.objects.create(
             title="Some Game",
             description="A" * 150,
-            publisher=self.pub,
-            developer=self.dev,
+            user_rating=0,
+            gameplay_duration=10,
             rating=7.0,
             cover="covers/test.jpg",
             release_date="2025-01-01"
         )
+        self.game.publisher.add(self.pub)
+        self.game.developer.add(self.dev)
 
     def test_str_method(self):
         review = GameReview.objects.create(
@@ -164,3 +206,877 @@ class GameReviewModelTest(TestCase):
             review.full_clean()
         except ValidationError:
             self.fail("Valid GameReview raised ValidationError unexpectedly")
+
+
+class GameReviewStatsTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='statsuser', password='pass')
+        self.other = get_user_model().objects.create_user(username='otheruser', password='pass')
+        self.game = Game.objects.create(
+            title="Stats Game",
+            description="A" * 150,
+            rating=7.0,
+            user_rating=0,
+            gameplay_duration=10,
+            cover="covers/test.jpg",
+            release_date="2025-01-01"
+        )
+
+    def review(self, author, score, recommend=True):
+        return GameReview.objects.create(
+            game=self.game,
+            author=author,
+            score=score,
+            recommend=recommend,
+            text="A long enough review text.",
+        )
+
+    def test_create_updates_stats(self):
+        self.review(self.user, 8)
+        self.review(self.other, 6, recommend=False)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.review_count, 2)
+        self.assertEqual(self.game.score_sum, 14)
+        self.assertEqual(self.game.recommend_count, 1)
+        self.assertEqual(self.game.user_rating, 7)
+
+    def test_edit_applies_delta(self):
+        self.review(self.user, 8)
+        review = GameReview.objects.get(author=self.user)
+        review.score = 4
+        review.recommend = False
+        review.save()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.review_count, 1)
+        self.assertEqual(self.game.score_sum, 4)
+        self.assertEqual(self.game.recommend_count, 0)
+        self.assertEqual(self.game.user_rating, 4)
+
+    def test_delete_reverts_stats(self):
+        self.review(self.user, 8)
+        self.review(self.other, 6)
+        GameReview.objects.filter(author=self.other).delete()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.review_count, 1)
+        self.assertEqual(self.game.score_sum, 8)
+        self.assertEqual(self.game.user_rating, 8)
+
+    def test_user_rating_not_editable(self):
+        self.assertNotIn('user_rating', modelform_factory(Game, fields='__all__')().fields)
+        game = Game.objects.create(title="Unreviewed", description="A" * 150, rating=7.0, gameplay_duration=10,
+                                   cover="covers/test.jpg", release_date="2025-01-01")
+        self.assertEqual(Game.objects.get(pk=game.pk).user_rating, 0)
+
+    def test_deleting_only_review_resets_rating(self):
+        self.review(self.user, 8)
+        GameReview.objects.filter(author=self.user).delete()
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.review_count, self.game.score_sum, self.game.user_rating), (0, 0, 0))
+
+    def test_rebuild_command(self):
+        self.review(self.user, 8)
+        self.review(self.other, 5, recommend=False)
+        Game.objects.update(review_count=0, score_sum=0, recommend_count=0)
+        call_command('rebuild_review_stats', stdout=StringIO())
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.review_count, 2)
+        self.assertEqual(self.game.score_sum, 13)
+        self.assertEqual(self.game.recommend_count, 1)
+        self.assertEqual(self.game.user_rating, 6.5)
+
+        # Games left without reviews lose their average too
+        GameReview.objects.all().delete()
+        Game.objects.update(user_rating=9)
+        call_command('rebuild_review_stats', stdout=StringIO())
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.review_count, self.game.user_rating), (0, 0))
+
+
+class ViewCounterTest(TestCase):
+
+    def setUp(self):
+        self.games = [
+            Game.objects.create(
+                title=f"Viewed Game {i}",
+                description="A" * 150,
+                rating=7.0,
+                user_rating=0,
+                gameplay_duration=10,
+                cover="covers/test.jpg",
+                release_date="2025-01-01"
+            )
+            for i in range(2)
+        ]
+        self.counter = ViewCounter()
+
+    def test_views_are_buffered_until_flush(self):
+        self.counter.add(self.games[0].pk)
+        self.counter.add(self.games[0].pk)
+        self.counter.add(self.games[1].pk)
+        self.assertEqual(Game.objects.get(pk=self.games[0].pk).total_views, 0)
+
+        version = catalog_version()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.counter.flush(), 3)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "games_game"')]), 1)
+        # Cached pages and sections outlive view counts
+        self.assertEqual(catalog_version(), version)
+
+        first, second = Game.objects.order_by('pk')
+        self.assertEqual((first.total_views, first.monthly_views, first.weekly_views), (2, 2, 2))
+        self.assertEqual((second.total_views, second.monthly_views, second.weekly_views), (1, 1, 1))
+
+    @override_settings(VIEW_COUNTER_FLUSH_SIZE=2)
+    def test_flushes_when_buffer_is_full(self):
+        self.counter.add(self.games[0].pk)
+        self.assertEqual(Game.objects.get(pk=self.games[0].pk).total_views, 0)
+        self.counter.add(self.games[1].pk)
+        self.assertEqual(Game.objects.get(pk=self.games[0].pk).total_views, 1)
+        self.assertEqual(self.counter.size, 0)
+
+
+class GameViewBucketTest(TestCase):
+
+    def setUp(self):
+        self.game = Game.objects.create(
+            title="Bucket Game",
+            description="A" * 150,
+            rating=7.0,
+            user_rating=0,
+            gameplay_duration=10,
+            cover="covers/test.jpg",
+            release_date="2025-01-01"
+        )
+        self.today = date(2025, 3, 15)
+
+    def test_flush_records_daily_bucket(self):
+        flush_view_counts({self.game.pk: 2}, day=self.today)
+        flush_view_counts({self.game.pk: 3}, day=self.today)
+        bucket = GameViewBucket.objects.get(game=self.game)
+        self.assertEqual((bucket.day, bucket.span, bucket.count), (self.today, GameViewBucket.Span.DAY, 5))
+
+    def test_flush_skips_deleted_games(self):
+        flush_view_counts({self.game.pk: 1, self.game.pk + 1000: 4}, day=self.today)
+        self.assertEqual(GameViewBucket.objects.count(), 1)
+
+    def test_refresh_uses_sliding_windows(self):
+        flush_view_counts({self.game.pk: 1}, day=self.today - timedelta(days=2))
+        flush_view_counts({self.game.pk: 10}, day=self.today - timedelta(days=10))
+        flush_view_counts({self.game.pk: 100}, day=self.today - timedelta(days=40))
+
+        refresh_view_windows(today=self.today)
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.weekly_views, self.game.monthly_views, self.game.total_views), (1, 11, 111))
+
+    def test_compaction_folds_old_days_into_months(self):
+        for days_ago in (40, 45, 70):
+            flush_view_counts({self.game.pk: days_ago}, day=self.today - timedelta(days=days_ago))
+        flush_view_counts({self.game.pk: 1}, day=self.today)
+
+        self.assertEqual(compact_view_buckets(30, today=self.today), 3)
+        buckets = list(GameViewBucket.objects.order_by('day').values_list('day', 'span', 'count'))
+        self.assertEqual(buckets, [
+            (date(2025, 1, 1), GameViewBucket.Span.MONTH, 115),
+            (date(2025, 2, 1), GameViewBucket.Span.MONTH, 40),
+            (self.today, GameViewBucket.Span.DAY, 1),
+        ])
+
+
+class GameViewTrackingTest(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('games.tracking.seen_views', SeenSet(10))
+        self.seen = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user(username='viewer', password='pass')
+        self.game = Game.objects.create(
+            title="Tracked Game",
+            description="A" * 150,
+            rating=7.0,
+            user_rating=0,
+            gameplay_duration=10,
+            cover="covers/test.jpg",
+            release_date="2025-01-01"
+        )
+
+    def test_unique_user_game(self):
+        GameView.objects.create(user=self.user, game=self.game)
+        with self.assertRaises(IntegrityError):
+            GameView.objects.create(user=self.user, game=self.game)
+
+    def test_first_view_only(self):
+        self.assertTrue(record_user_view(self.user.pk, self.game.pk))
+        with self.assertNumQueries(0):
+            self.assertFalse(record_user_view(self.user.pk, self.game.pk))
+        self.assertEqual(GameView.objects.count(), 1)
+
+    def test_existing_view_is_ignored(self):
+        # e.g. recorded by another process, so not in this one's seen set
+        GameView.objects.create(user=self.user, game=self.game)
+        self.assertFalse(record_user_view(self.user.pk, self.game.pk))
+        self.assertEqual(GameView.objects.count(), 1)
+
+    def test_seen_set_is_bounded(self):
+        seen = SeenSet(2)
+        seen.add(1)
+        seen.add(2)
+        self.assertIn(1, seen)
+        seen.add(3)
+        self.assertEqual(len(seen), 2)
+        self.assertNotIn(2, seen)
+        self.assertIn(1, seen)
+
+
+class SessionViewTrackingTest(TestCase):
+
+    def test_counts_each_game_once(self):
+        session = {}
+        self.assertTrue(record_session_view(session, 5))
+        self.assertTrue(record_session_view(session, 2))
+        self.assertFalse(record_session_view(session, 5))
+        self.assertEqual(session['viewed_games']['ids'], [2, 5])
+
+    @override_settings(SESSION_VIEWS_MAX_SIZE=2)
+    def test_stops_counting_when_full(self):
+        session = {}
+        record_session_view(session, 1)
+        record_session_view(session, 2)
+        self.assertFalse(record_session_view(session, 3))
+        self.assertEqual(session['viewed_games']['ids'], [1, 2])
+
+    @override_settings(SESSION_VIEWS_TTL=60)
+    def test_expires(self):
+        session = {}
+        record_session_view(session, 1)
+        session['viewed_games']['since'] -= 61
+        self.assertTrue(record_session_view(session, 1))
+
+
+class GameSearchTest(TestCase):
+
+    def setUp(self):
+        self.studio = DeveloperAndPublisher.objects.create(name="Moonlight Studio", is_dev=True)
+        self.knight = self.create_game("Hollow Knight", "A bug kingdom adventure " * 5)
+        self.knight.developer.add(self.studio)
+        self.racer = self.create_game("Night Racer", "Races through a hollow city " * 5, subtitle="Turbo Edition")
+
+    def create_game(self, title, description, subtitle=None):
+        return Game.objects.create(
+            title=title,
+            subtitle=subtitle,
+            description=description,
+            rating=7.0,
+            user_rating=0,
+            gameplay_duration=10,
+            cover="covers/test.jpg",
+            release_date="2025-01-01"
+        )
+
+    def search(self, query):
+        return list(search.search_games(Game.objects.all(), query))
+
+    def test_index_available(self):
+        self.assertTrue(search.fts_available())
+
+    def test_title_ranks_above_description(self):
+        self.assertEqual(self.search('hollow'), [self.knight, self.racer])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('hollow kni'), [self.knight])
+        self.assertEqual(self.search('turb'), [self.racer])
+
+    def test_studios_are_indexed(self):
+        self.assertEqual(self.search('moonlight'), [self.knight])
+        self.studio.name = "Sunrise Studio"
+        self.studio.save()
+        self.assertEqual(self.search('moonlight'), [])
+        self.assertEqual(self.search('sunrise'), [self.knight])
+
+    def test_edits_and_deletes_are_indexed(self):
+        self.racer.title = "Day Racer"
+        self.racer.save()
+        self.assertEqual(self.search('day'), [self.racer])
+        self.racer.delete()
+        self.assertEqual(self.search('racer'), [])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        self.assertEqual(self.search('hollow'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('hollow'), [self.knight, self.racer])
+
+    def test_fallback_without_index(self):
+        with mock.patch.object(search, 'fts_available', return_value=False):
+            self.assertEqual(self.search('moonlight'), [self.knight])
+            self.assertEqual(self.search('turbo'), [self.racer])
+
+
+class PrefixIndexTest(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('games.suggest.suggest_index', PrefixIndex())
+        self.index = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.zelda = self.create_game("The Legend of Zelda", subtitle="Breath of the Wild", views=10)
+        self.zero = self.create_game("Zero Mission", views=50)
+
+    def create_game(self, title, subtitle=None, views=0):
+        return Game.objects.create(
+            title=title,
+            subtitle=subtitle,
+            description="A" * 150,
+            rating=7.0,
+            user_rating=0,
+            gameplay_duration=10,
+            total_views=views,
+            cover="covers/test.jpg",
+            release_date="2025-01-01"
+        )
+
+    def titles(self, prefix):
+        return [result['title'] for result in self.index.suggest(prefix)]
+
+    def test_matches_word_prefixes(self):
+        self.assertEqual(self.titles('legend of'), ["The Legend of Zelda"])
+        self.assertEqual(self.titles('wild'), ["The Legend of Zelda"])
+        self.assertEqual(self.titles('x'), [])
+
+    def test_orders_by_views(self):
+        self.assertEqual(self.titles('ze'), ["Zero Mission", "The Legend of Zelda"])
+
+    def test_ranks_every_match(self):
+        Game.objects.bulk_create(
+            Game(title=f"Aardvark {i}", description="A" * 150, rating=7.0, user_rating=0, gameplay_duration=10,
+                 cover="covers/test.jpg", release_date="2025-01-01")
+            for i in range(600)
+        )
+        self.create_game("Azure Skies", views=100)
+        self.assertEqual(self.titles('a')[0], "Azure Skies")
+        self.assertEqual(self.titles('aardvark 59')[:2], ["Aardvark 59", "Aardvark 590"])
+
+    def test_short_prefixes_follow_updates(self):
+        self.index.build()
+        self.zelda.total_views = 100
+        self.zelda.save()
+        self.assertEqual(self.titles('z'), ["The Legend of Zelda", "Zero Mission"])
+        self.zero.delete()
+        self.assertEqual(self.titles('ze'), ["The Legend of Zelda"])
+        # Kept ranked beside the index, not looked up on each keystroke
+        self.assertEqual(self.index.top['zer'], [])
+
+    def test_served_from_memory(self):
+        self.index.build()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('zero'), ["Zero Mission"])
+
+    def test_updated_on_save_and_delete(self):
+        self.index.build()
+        self.zero.title = "Metroid Zero Mission"
+        self.zero.save()
+        self.create_game("Zeal")
+        self.zelda.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('ze'), ["Metroid Zero Mission", "Zeal"])
+            self.assertEqual(self.titles('metroid'), ["Metroid Zero Mission"])
+
+
+class FeaturedSamplerTest(TestCase):
+
+    def setUp(self):
+        self.games = [
+            Game.objects.create(
+                title=f"Featured Game {i}",
+                description="A" * 150,
+                rating=i,
+                user_rating=i,
+                gameplay_duration=10,
+                total_views=i * 100,
+                cover="covers/test.jpg",
+                release_date="2025-01-01"
+            )
+            for i in range(10)
+        ]
+        self.sampler = FeaturedSampler()
+
+    def test_distinct_games(self):
+        ids = self.sampler.sample(5)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+        self.assertTrue(set(ids) <= {game.pk for game in self.games})
+
+    def test_small_catalog(self):
+        self.assertEqual(sorted(self.sampler.sample(20)), sorted(game.pk for game in self.games))
+
+    def test_no_queries_once_built(self):
+        self.sampler.build()
+        with self.assertNumQueries(0):
+            self.sampler.sample(5)
+
+    def test_pinned_games_come_first(self):
+        Game.objects.filter(pk=self.games[0].pk).update(featured=True)
+        self.sampler.build()
+        for _ in range(5):
+            self.assertEqual(self.sampler.sample(3)[0], self.games[0].pk)
+
+    def test_weights(self):
+        self.sampler.build()
+        # Every game keeps a chance, and the alias table is a valid distribution
+        self.assertTrue(all(0 < p <= 1 for p in self.sampler.prob))
+        counts = {pk: 0 for pk in self.sampler.ids}
+        for _ in range(5000):
+            counts[self.sampler.draw()] += 1
+        self.assertGreater(counts[self.games[9].pk], counts[self.games[0].pk])
+
+
+class QueryPlanTest(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('Every hot query reads an index.', out.getvalue())
+
+    def test_full_scan_detected(self):
+        plan = Game.objects.order_by('gameplay_duration').explain()
+        self.assertTrue(list(full_scans(plan)))
+
+
+@skipUnless(importlib.util.find_spec('scipy'), 'needs the recommendations extras')
+class RelatedGamesTest(TestCase):
+
+    def setUp(self):
+        self.action = Genre.objects.create(name="Action")
+        self.rpg = Genre.objects.create(name="RPG")
+        self.pc = Platform.objects.create(name="PC")
+        self.games = []
+        for i, genres in enumerate([[self.action, self.rpg], [self.action, self.rpg], [self.action], [self.rpg], []]):
+            game = Game.objects.create(
+                title=f"Related Game {i}",
+                description="A" * 150,
+                rating=8,
+                user_rating=8,
+                gameplay_duration=10,
+                cover="covers/test.jpg",
+                release_date="2025-01-01"
+            )
+            game.genres.add(*genres)
+            game.platforms.add(self.pc)
+            self.games.append(game)
+
+    def related(self, game):
+        return list(game.related_games.order_by('-score').values_list('other', flat=True))
+
+    def test_build(self):
+        out = StringIO()
+        call_command('build_related_games', '--top', '2', '--chunk-size', '2', stdout=out)
+        self.assertIn('Stored', out.getvalue())
+
+        first, second, third, fourth, fifth = self.games
+        # Same genres beat one shared genre, and no game is related to itself
+        self.assertEqual(self.related(first)[0], second.pk)
+        self.assertEqual(len(self.related(first)), 2)
+        self.assertNotIn(first.pk, self.related(first))
+        # Sharing only a platform still counts, a little
+        self.assertTrue(self.related(fifth))
+        self.assertLess(RelatedGame.objects.filter(game=fifth).first().score, RelatedGame.objects.get(game=first, other=second).score)
+
+    def test_co_reviews(self):
+        first, second, third, fourth, fifth = self.games
+        for username in ('a', 'b'):
+            user = get_user_model().objects.create_user(username=username, password='pass1234')
+            for game in (third, fifth):
+                GameReview.objects.create(game=game, author=user, score=9, text="A review long enough to pass.")
+
+        call_command('build_related_games', stdout=StringIO())
+        self.assertEqual(self.related(fifth)[0], third.pk)
+
+    def test_rebuild_replaces_rows(self):
+        call_command('build_related_games', stdout=StringIO())
+        count = RelatedGame.objects.count()
+        call_command('build_related_games', stdout=StringIO())
+        self.assertEqual(RelatedGame.objects.count(), count)
+
+
+@skipUnless(importlib.util.find_spec('scipy'), 'needs the recommendations extras')
+class GameNeighboursTest(TestCase):
+
+    def setUp(self):
+        self.a, self.b, self.c, self.d, self.e = [
+            Game.objects.create(
+                title=f"Neighbour Game {i}",
+                description="A" * 150,
+                rating=8,
+                user_rating=8,
+                gameplay_duration=10,
+                cover="covers/test.jpg",
+                release_date="2025-01-01"
+            )
+            for i in range(5)
+        ]
+        self.users = [get_user_model().objects.create_user(username=f'player{i}', password='pass1234') for i in range(4)]
+        scores = [
+            {self.a: 9, self.b: 9, self.c: 2},
+            {self.a: 8, self.b: 9, self.c: 3},
+            {self.a: 9, self.b: 8, self.d: 5},
+        ]
+        for user, reviews in zip(self.users, scores):
+            for game, score in reviews.items():
+                self.review(user, game, score)
+
+    def review(self, user, game, score):
+        return GameReview.objects.create(game=game, author=user, score=score, text="A review long enough to pass.")
+
+    def neighbours(self, game):
+        return list(game.neighbours.order_by('-similarity').values_list('other', flat=True))
+
+    def refresh(self, *args):
+        out = StringIO()
+        call_command('refresh_game_neighbours', *args, stdout=out)
+        return out.getvalue()
+
+    def test_liked_together(self):
+        self.assertIn('Refreshed the neighbours of 5 games.', self.refresh('--full'))
+        self.assertEqual(self.neighbours(self.a)[0], self.b.pk)
+        # Scored in opposite directions by the same players
+        self.assertNotIn(self.c.pk, self.neighbours(self.a))
+        self.assertEqual(self.neighbours(self.e), [])
+
+    def test_incremental_refresh(self):
+        self.refresh('--full')
+        self.assertIn('Refreshed the neighbours of 0 games.', self.refresh())
+
+        # Only the games sharing a player with the changed game are compared again
+        self.review(self.users[3], self.d, 7)
+        self.assertIn('Refreshed the neighbours of 3 games.', self.refresh())
+        self.assertFalse(Game.objects.filter(neighbours_stale=True).exists())
+
+    def test_deleted_review_marks_author_games(self):
+        self.refresh('--full')
+        GameReview.objects.filter(author=self.users[2], game=self.d).delete()
+        self.assertEqual(set(Game.objects.filter(neighbours_stale=True)), {self.a, self.b, self.d})
+
+
+class GameRankingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.games = [
+            Game.objects.create(
+                title=f"Ranked Game {i}",
+                description="A" * 150,
+                rating=8,
+                user_rating=0,
+                gameplay_duration=10,
+                cover="covers/test.jpg",
+                release_date="2025-01-01"
+            )
+            for i in range(4)
+        ]
+        self.users = [get_user_model().objects.create_user(username=f'ranker{i}', password='pass1234') for i in range(5)]
+
+    def review(self, user, game, score):
+        return GameReview.objects.create(game=game, author=user, score=score, text="A review long enough to pass.")
+
+    def assertRanksConsistent(self):
+        games = Game.objects.order_by('rank')
+        self.assertEqual([game.rank for game in games], list(range(1, len(self.games) + 1)))
+        self.assertEqual(list(games), sorted(games, key=lambda game: (-game.weighted_rating, game.pk)))
+
+    def test_new_games_rated(self):
+        mean, weight = rating_prior()
+        self.assertTrue(all(game.weighted_rating == mean for game in Game.objects.all()))
+        # Left for the periodic rebuild to rank
+        self.assertTrue(all(game.rank is None for game in Game.objects.all()))
+        rebuild_rankings()
+        self.assertRanksConsistent()
+
+    def test_single_review_does_not_win(self):
+        rebuild_rankings()
+        many, single = self.games[0], self.games[1]
+        for user in self.users:
+            self.review(user, many, 9)
+        self.review(self.users[0], single, 10)
+        for user in self.users:
+            self.review(user, self.games[2], 2)
+        rebuild_rankings()
+
+        many.refresh_from_db()
+        single.refresh_from_db()
+        self.assertGreater(single.user_rating, many.user_rating)
+        self.assertLess(many.rank, single.rank)
+        self.assertRanksConsistent()
+
+    def test_reviews_move_weighted_rating_not_ranks(self):
+        rebuild_rankings()
+        ranks = dict(Game.objects.values_list('pk', 'rank'))
+        with self.assertNumQueries(3):
+            review = self.review(self.users[0], self.games[3], 10)
+        game = Game.objects.get(pk=self.games[3].pk)
+        self.assertGreater(game.weighted_rating, rating_prior()[0])
+        self.assertEqual(dict(Game.objects.values_list('pk', 'rank')), ranks)
+
+        review.score = 0
+        review.save()
+        rebuild_rankings()
+        self.assertRanksConsistent()
+        self.assertEqual(Game.objects.get(rank=4), self.games[3])
+        review.delete()
+        rebuild_rankings()
+        self.assertRanksConsistent()
+
+    def test_prior_cached_for_its_ttl(self):
+        self.assertEqual(rating_prior()[0], 5.0)
+        self.review(self.users[0], self.games[0], 9)
+        self.assertEqual(rating_prior()[0], 5.0)
+        with override_settings(RATING_PRIOR_TTL=0):
+            refresh_rating_prior()
+            self.review(self.users[1], self.games[1], 3)
+            self.assertEqual(rating_prior()[0], 6.0)
+
+    def test_deleted_game_closes_gap(self):
+        self.review(self.users[0], self.games[1], 10)
+        rebuild_rankings()
+        self.games[1].delete()
+        self.games.pop(1)
+        self.assertRanksConsistent()
+
+    def test_rebuild_command(self):
+        Game.objects.update(rank=None, weighted_rating=0)
+        out = StringIO()
+        call_command('rebuild_rankings', stdout=out)
+        self.assertIn('Ranked 4 games.', out.getvalue())
+        self.assertRanksConsistent()
+
+
+class GameUpdatedAtTest(TestCase):
+
+    def setUp(self):
+        self.game = Game.objects.create(
+            title="Stamped Game",
+            description="A" * 150,
+            rating=8,
+            user_rating=0,
+            gameplay_duration=10,
+            cover="covers/test.jpg",
+            release_date="2025-01-01"
+        )
+        self.stamp = Game.objects.get(pk=self.game.pk).updated_at
+
+    def assertTouched(self):
+        updated_at = Game.objects.get(pk=self.game.pk).updated_at
+        self.assertGreater(updated_at, self.stamp)
+        self.stamp = updated_at
+
+    def test_related_changes_touch_game(self):
+        genre = Genre.objects.create(name="Puzzle")
+        self.game.genres.add(genre)
+        self.assertTouched()
+        genre.name = "Puzzles"
+        genre.save()
+        self.assertTouched()
+        studio = DeveloperAndPublisher.objects.create(name="Studio", is_dev=True)
+        studio.published_games.add(self.game)
+        self.assertTouched()
+        studio.delete()
+        self.assertTouched()
+
+    def test_bulk_updates_touch_game(self):
+        flush_view_counts({self.game.pk: 3})
+        self.assertTouched()
+        user = get_user_model().objects.create_user(username='stamper', password='pass1234')
+        review = GameReview.objects.create(game=self.game, author=user, score=7, text="A review long enough to pass.")
+        self.assertTouched()
+
+        # Edits that leave the stats alone still count as the game being reviewed
+        reviewed_at = Game.objects.get(pk=self.game.pk).reviewed_at
+        review.text = "An edited review, still long enough."
+        review.save()
+        self.assertGreater(Game.objects.get(pk=self.game.pk).reviewed_at, reviewed_at)
+
+
+class GameThumbnailsTest(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        patcher = override_settings(MEDIA_ROOT=media_root.name)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def image(self, name, size=(800, 1000)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_game(self, **kwargs):
+        return Game.objects.create(title="Pictured Game", description="A" * 150, rating=8, user_rating=0,
+                                   gameplay_duration=10, release_date="2025-01-01", **kwargs)
+
+    def test_thumbnails_made_on_upload(self):
+        game = self.create_game(cover=self.image('cover.png'), banner=self.image('banner.png', (300, 200)))
+        self.assertEqual(Game.objects.get(pk=game.pk).thumbnails, {'cover': game.cover.name, 'banner': game.banner.name})
+        self.assertTrue(game.cover_thumb.url.endswith('.thumb.jpg'))
+        self.assertTrue(game.cover_thumb.webp_url.endswith('.thumb.webp'))
+        with default_storage.open(variant_name(game.cover.name, 'thumb', 'webp')) as f, Image.open(f) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (320, 450)))
+
+        # Never blown up past the original, and remade along with a new file
+        with default_storage.open(variant_name(game.banner.name, 'hero', 'jpg')) as f, Image.open(f) as image:
+            self.assertEqual(image.size, (300, 169))
+        old_thumb = variant_name(game.cover.name, 'thumb', 'jpg')
+        game.cover = self.image('other.png')
+        game.save()
+        self.assertFalse(default_storage.exists(old_thumb))
+        self.assertTrue(default_storage.exists(variant_name(game.cover.name, 'thumb', 'jpg')))
+
+    def test_missing_image_falls_back_to_original(self):
+        game = self.create_game(cover="covers/missing.jpg")
+        self.assertEqual(game.thumbnails, {})
+        self.assertEqual(game.cover_thumb, (game.cover.url, None))
+
+    def test_oversized_image_falls_back_to_original(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000), self.assertLogs('games.images', 'WARNING'):
+            game = self.create_game(cover=self.image('huge.png'))
+        self.assertEqual(Game.objects.get(pk=game.pk).thumbnails, {})
+        self.assertEqual(game.cover_thumb, (game.cover.url, None))
+
+    def test_build_thumbnails_command(self):
+        game = self.create_game(cover="covers/later.png")
+        default_storage.save(game.cover.name, self.image('later.png'))
+        self.create_game(cover="covers/missing.jpg")
+
+        out = StringIO()
+        call_command('build_thumbnails', workers=1, stdout=out, stderr=StringIO())
+        self.assertIn('Made the thumbnails of 1 images of 1 games.', out.getvalue())
+        self.assertIn('1 images could not be read.', out.getvalue())
+        self.assertEqual(Game.objects.get(pk=game.pk).thumbnails, {'cover': game.cover.name})
+
+
+class ImportCatalogTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        patcher = override_settings(MEDIA_ROOT=os.path.join(self.dir.name, 'media'))
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.studio = DeveloperAndPublisher.objects.create(name="Old Studio", is_pub=True)
+
+    def dump(self, name, content):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def row(self, title, **kwargs):
+        return {'title': title, 'description': "A" * 150, 'rating': 8, 'release_date': '2025-01-01', **kwargs}
+
+    def test_import_jsonl(self):
+        rows = [
+            self.row("Imported One", developers=["Old Studio", "New Studio"], publishers=["New Studio"],
+                     genres=["Sci-Fi", "Sci Fi", "Sci-Fi"], platforms=["PC"]),
+            self.row("Imported Two", developers=["New Studio"], genres=["Sci-Fi"], online=True),
+            {'title': "No Rating"},
+        ]
+        path = self.dump('games.jsonl', '\n'.join(json.dumps(row) for row in rows))
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', path, batch_size=1, stdout=out, stderr=err)
+        self.assertIn('Imported 2 games, created 1 developers, 2 genres, 1 platforms.', out.getvalue())
+        self.assertIn("line 3: KeyError: 'rating'", err.getvalue())
+
+        one, two = Game.objects.get(title="Imported One"), Game.objects.get(title="Imported Two")
+        self.assertEqual(sorted(one.developer.values_list('name', flat=True)), ["New Studio", "Old Studio"])
+        self.assertEqual(sorted(one.genres.values_list('slug', flat=True)), ['sci-fi', 'sci-fi-2'])
+        self.assertEqual(list(two.genres.all()), [Genre.objects.get(name="Sci-Fi")])
+        self.assertTrue(two.online)
+        self.assertTrue(DeveloperAndPublisher.objects.get(name="Old Studio").is_dev)
+        self.assertTrue(DeveloperAndPublisher.objects.get(name="New Studio").is_pub)
+        self.assertEqual(sorted(Game.objects.values_list('rank', flat=True)), [1, 2])
+        if search.fts_available():
+            self.assertEqual(search.ranked_ids('imported two'), [two.pk])
+
+    def test_malformed_rows_skipped(self):
+        lines = [
+            json.dumps(["Not", "An", "Object"]),
+            json.dumps(self.row("String Genres", genres="Action")),
+            json.dumps(self.row("Numbered Cover", cover=5)),
+            json.dumps(self.row(None)),
+            json.dumps(self.row("Kept", genres=["Action"])),
+        ]
+        path = self.dump('games.jsonl', '\n'.join(lines))
+        err = StringIO()
+        call_command('import_catalog', path, images_dir=self.dir.name, workers=1, stdout=StringIO(), stderr=err)
+        self.assertIn('line 1: TypeError: expected an object, got list', err.getvalue())
+        self.assertIn('line 2: TypeError: genres must be a list of names', err.getvalue())
+        self.assertIn('line 3: TypeError: cover must be a file path', err.getvalue())
+        self.assertIn('line 4: ValueError: title must be a non-empty string', err.getvalue())
+        self.assertEqual(list(Game.objects.values_list('title', flat=True)), ["Kept"])
+
+    def test_failed_batch_forgets_its_names(self):
+        importer = CatalogImporter()
+        with mock.patch('games.catalog.search.index_games', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            importer.run([(1, self.row("Rolled Back", genres=["Lost"]))])
+        self.assertFalse(Genre.objects.filter(name="Lost").exists())
+        self.assertNotIn("Lost", importer.maps['genres'].ids)
+        self.assertEqual(importer.maps['genres'].created, 0)
+
+    def test_import_csv_with_images(self):
+        os.mkdir(os.path.join(self.dir.name, 'images'))
+        Image.new('RGB', (600, 800), 'teal').save(os.path.join(self.dir.name, 'images', 'one.png'))
+        path = self.dump('games.csv', 'title,description,rating,release_date,genres,cover\n'
+                                      f'CSV Game,{"A" * 150},7.5,2025-01-01,Action|RPG,one.png\n'
+                                      f'Missing Cover,{"A" * 150},7.5,2025-01-01,,two.png\n')
+        err = StringIO()
+        call_command('import_catalog', path, images_dir=os.path.join(self.dir.name, 'images'), workers=1,
+                     stdout=StringIO(), stderr=err)
+        self.assertIn('line 3: cover not imported', err.getvalue())
+
+        game = Game.objects.get(title="CSV Game")
+        self.assertEqual(game.genres.count(), 2)
+        self.assertTrue(default_storage.exists(game.cover.name))
+        self.assertEqual(game.thumbnails, {'cover': game.cover.name})
+        self.assertEqual(Game.objects.get(title="Missing Cover").cover.name, '')
+
+
+class ExportCatalogTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.create(name="Racing")
+        cls.platform = Platform.objects.create(name="PC")
+        cls.user = get_user_model().objects.create_user(username='exporter', password='pass1234')
+        for i in range(5):
+            game = Game.objects.create(title=f"Exported {i}", description="A" * 150, rating=8, user_rating=0,
+                                       gameplay_duration=10, cover="covers/test.jpg", release_date="2025-01-01")
+            game.genres.add(cls.genre)
+        review = GameReview.objects.create(game=game, author=cls.user, score=6, text="Exported review, long enough.")
+        review.platforms.add(cls.platform)
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_relations_looked_up_per_chunk(self):
+        # The games, then each relation once for every chunk of 2
+        with self.assertNumQueries(1 + 3 * 4):
+            rows = list(game_rows(chunk_size=2))
+        self.assertEqual([row['genres'] for row in rows], [["Racing"]] * 5)
+
+    def test_export_games_round_trip(self):
+        path = os.path.join(self.dir.name, 'games.jsonl.gz')
+        out = StringIO()
+        call_command('export_catalog', 'games', output=path, chunk_size=2, stdout=out)
+        self.assertIn('Exported 5 games', out.getvalue())
+
+        rows = [row for _, row in read_rows(path)]
+        self.assertEqual([row['title'] for row in rows], [f"Exported {i}" for i in range(5)])
+        self.assertEqual(rows[0]['release_date'], '2025-01-01')
+
+    def test_export_reviews_csv(self):
+        path = os.path.join(self.dir.name, 'reviews.csv.gz')
+        call_command('export_catalog', 'reviews', output=path, stdout=StringIO())
+        with gzip.open(path, 'rt', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['author_name'], rows[0]['platforms'], rows[0]['score']), ('exporter', 'PC', '6.0'))
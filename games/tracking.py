@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+
+from .models import GameView
+
+# Signed cookie remembering the games viewed by anonymous visitors without a session
+VIEWED_GAMES_COOKIE = 'viewed_games'
+
+
+class SeenSet:
+    """
+    Thread safe set that forgets its least recently used keys once it holds
+    more than maxsize of them.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self.lock:
+            if key in self.keys:
+                self.keys.move_to_end(key)
+                return True
+            return False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key):
+        with self.lock:
+            self.keys[key] = None
+            self.keys.move_to_end(key)
+            while len(self.keys) > self.maxsize:
+                self.keys.popitem(last=False)
+
+
+seen_views = SeenSet(getattr(settings, 'SEEN_VIEWS_MAX_SIZE', 50000))
+
+
+def record_user_view(user_id, game_id):
+    """
+    Remember that a user has opened a game page. Returns True only the first
+    time, so the caller knows whether to count the view.
+    """
+    key = (user_id, game_id)
+    if key in seen_views:
+        return False
+
+    # Insert-or-ignore: the unique constraint decides, not a SELECT beforehand
+    try:
+        with transaction.atomic():
+            GameView.objects.create(user_id=user_id, game_id=game_id)
+        created = True
+    except IntegrityError:
+        created = False
+
+    seen_views.add(key)
+    return created
+
+
+def record_session_view(session, game_id):
+    """
+    Anonymous counterpart of record_user_view, remembering the viewed games as a
+    sorted list of ids in the session.
+
+    The list is dropped after SESSION_VIEWS_TTL seconds, and once it holds
+    SESSION_VIEWS_MAX_SIZE games nothing more is counted for that session until
+    then, so crawlers can't inflate views or keep rewriting the session.
+    """
+    now = int(time.time())
+    viewed = session.get('viewed_games')
+    if not viewed or now - viewed['since'] > getattr(settings, 'SESSION_VIEWS_TTL', 86400):
+        viewed = {'since': now, 'ids': []}
+
+    ids = viewed['ids']
+    i = bisect_left(ids, game_id)
+    if i < len(ids) and ids[i] == game_id:
+        return False
+    if len(ids) >= getattr(settings, 'SESSION_VIEWS_MAX_SIZE', 200):
+        return False
+
+    ids.insert(i, game_id)
+    session['viewed_games'] = viewed
+    return True
+
+
+def record_anonymous_view(req, game_id):
+    """
+    Count a view of an anonymous request once per visitor. Visitors with a
+    session are remembered in it (see record_session_view). Those without a
+    session cookie get the same sorted id list in a signed cookie instead,
+    so no session row is written for them; set_viewed_games_cookie() adds it
+    to the response.
+    """
+    if req.session.session_key:
+        return record_session_view(req.session, game_id)
+
+    state = {}
+    try:
+        viewed = json.loads(req.get_signed_cookie(VIEWED_GAMES_COOKIE, salt=VIEWED_GAMES_COOKIE,
+                                                  max_age=getattr(settings, 'SESSION_VIEWS_TTL', 86400)))
+        state['viewed_games'] = {'since': int(viewed['since']), 'ids': sorted(int(pk) for pk in viewed['ids'])}
+    except (KeyError, TypeError, ValueError, signing.BadSignature):
+        pass
+    if not record_session_view(state, game_id):
+        return False
+    req.viewed_games = state['viewed_games']
+    return True
+
+
+def set_viewed_games_cookie(req, response):
+    # The ids record_anonymous_view remembered for a visitor without a session
+    if hasattr(req, 'viewed_games'):
+        response.set_signed_cookie(
+            VIEWED_GAMES_COOKIE, json.dumps(req.viewed_games, separators=(',', ':')), salt=VIEWED_GAMES_COOKIE,
+            max_age=getattr(settings, 'SESSION_VIEWS_TTL', 86400), httponly=True, samesite='Lax',
+        )
+    return response
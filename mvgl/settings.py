@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'games.apps.GamesConfig',
     'pages.apps.PagesConfig',
     'accounts.apps.AccountsConfig',
+    'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
@@ -84,6 +85,45 @@ DATABASES = {
 }
 
 
+# Cache
+# Per-process memory cache for development; use a shared backend (file based, Redis, Memcached)
+# when running several processes so catalog invalidations reach all of them
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mvgl',
+    }
+}
+
+# Seconds the home page sections are cached for, on top of being invalidated when the catalog changes.
+# Sections ordered by views are only refreshed by this running out, not by each flush of view counts
+SECTION_CACHE_TTL = 300
+
+# Seconds before each process rebuilds its weighted table of featured game candidates
+FEATURED_REFRESH_INTERVAL = 600
+
+# Reviews the mean score of all reviews counts as in every game's weighted rating
+RATING_PRIOR_REVIEWS = 10
+
+# Seconds that mean is cached for before it is worked out again from every game
+RATING_PRIOR_TTL = 60 * 60
+
+# Seconds whole home and game list pages are cached for anonymous visitors, on top of being invalidated when the catalog changes
+PAGE_CACHE_TTL = 60
+
+# Serve the home, game list and game detail pages with their async views, for deployments under ASGI
+ASYNC_VIEWS = False
+
+# Games or reviews per page of the JSON API, by default and at most
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Most games one batch lookup can ask for, and seconds each game is cached for on top of being invalidated when it changes
+API_BATCH_MAX_IDS = 100
+API_GAME_CACHE_TTL = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -139,6 +179,30 @@ STATIC_URL = 'static/'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 
+# View counting
+# Game page views are buffered in memory and written in batches once either limit is hit
+
+VIEW_COUNTER_FLUSH_SIZE = 100
+VIEW_COUNTER_FLUSH_INTERVAL = 30 # seconds
+
+# (user, game) pairs each process remembers as already viewed, to skip the database on repeat visits
+SEEN_VIEWS_MAX_SIZE = 50000
+
+# Games an anonymous session, or the signed cookie of a visitor without one, is counted a view for, and how long it remembers them
+SESSION_VIEWS_MAX_SIZE = 200
+SESSION_VIEWS_TTL = 60 * 60 * 24 # seconds
+
+# Search
+# Most full-text matches a search ranks before they are paginated
+
+SEARCH_MAX_RESULTS = 1000
+
+# Seconds before each process rebuilds its in-memory title index for search suggestions
+SUGGEST_INDEX_TTL = 600
+
+# Seconds the total number of games matching a list page filter is cached for
+PAGINATION_COUNT_TTL = 300
+
 # Password reset
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
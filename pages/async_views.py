@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from calendar import timegm
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from games.counters import view_counter
+from games.featured import featured_ids
+from games.forms import GameReviewForm
+from games.models import Game, Genre
+from games.pagination import CachedCountPaginator, akeyset_page, clean_cursor
+from games.sections import acatalog_version, aget_sections, arecommendations_version, views_bucket
+from games.tracking import set_viewed_games_cookie
+from pages import views
+from pages.page_cache import cache_anonymous_page
+
+logger = logging.getLogger(__name__)
+
+# Writes still running after their response went out, held on to so they are not garbage collected
+background_tasks = set()
+
+def fire_and_forget(func, *args):
+    task = asyncio.create_task(sync_to_async(func)(*args))
+    background_tasks.add(task)
+    task.add_done_callback(background_task_done)
+
+def background_task_done(task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error('Background write failed', exc_info=task.exception())
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
+
+async def arender(req, template_name, ctx):
+    # Templates can still query, for cached fragments that are missing and for the session behind the user header
+    return await sync_to_async(render)(req, template_name, ctx)
+
+async def respond_conditionally(req, etag, last_modified, view, *args):
+    # What the condition decorator does, with the validators worked out without blocking
+    etag = quote_etag(etag)
+    last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+    response = get_conditional_response(req, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await view(req, *args)
+        if req.method in ('GET', 'HEAD'):
+            response.headers.setdefault('ETag', etag)
+            if last_modified:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+@cache_anonymous_page
+async def home_page_view(req):
+    # The featured sampler may have to rebuild its table first
+    sections = await aget_sections(extra={'featured': await sync_to_async(featured_ids)(5)})
+    return await arender(req, 'index.html', views.home_context(sections))
+
+@cache_anonymous_page
+async def game_list_page(req):
+    params = views.game_list_params(req)
+    genres = await alist(views.filtered_genres(params['genre_filter'])) if params['genre_filter'] else []
+    # Full-text matches are looked up with a raw query
+    games, ordering = await sync_to_async(views.game_list_queryset)(params, genres)
+
+    paginator = CachedCountPaginator(games, 16)
+    cursor = clean_cursor(params['cursor'], Game, ordering) if ordering else None
+    if cursor:
+        load_page = akeyset_page(games, ordering, 16, cursor)
+    else:
+        load_page = paginator.aget_page(1 if params['cursor'] else params['page'])
+    games_page, most_viewed_games, genres = await asyncio.gather(
+        load_page,
+        alist(Game.objects.order_by('-total_views')[:6]),
+        alist(Genre.objects.all()),
+    )
+
+    ctx = views.game_list_context(params, games_page, paginator, ordering, most_viewed_games, genres)
+    return await arender(req, 'game_list.html', ctx)
+
+async def games_search_page_view(req):
+    user = await req.auser()
+    etag = views.make_etag('games', await acatalog_version(), views_bucket(), req.get_full_path(), user.pk)
+    return await respond_conditionally(req, etag, None, game_list_page)
+
+async def game_detail_page(req, pk, user):
+    game = await aget_object_or_404(Game, pk=pk)
+
+    # Counted as the sync view does, the buffered count is added once the response is on its way
+    if await sync_to_async(views.record_view)(req, user, game.pk):
+        fire_and_forget(view_counter.add, game.pk)
+        game.total_views += 1
+
+    reviews, related_games, also_liked_games = await asyncio.gather(
+        alist(game.reviews.select_related('author')),
+        alist(views.precomputed_related_games(game)),
+        alist(views.also_liked_games(game)),
+    )
+    related_games = related_games or await alist(views.genre_related_games(game))
+
+    ctx = views.game_detail_context(game, reviews, related_games, also_liked_games, GameReviewForm())
+    return set_viewed_games_cookie(req, await arender(req, 'game_details.html', ctx))
+
+async def game_detail_view(req, pk):
+    if req.method == 'POST':
+        # Reviews are rare next to page views, the sync view takes them
+        return await sync_to_async(views.game_detail_view)(req, pk)
+
+    stamps = await aget_object_or_404(Game.objects.values_list('updated_at', 'reviewed_at'), pk=pk)
+    user = await req.auser()
+    etag = views.make_etag('game', pk, *stamps, await arecommendations_version(), user.pk)
+    return await respond_conditionally(req, etag, views.game_last_modified(stamps, user), game_detail_page, pk, user)
@@ -0,0 +1,88 @@
+import hashlib
+import re
+from functools import wraps
+from inspect import iscoroutinefunction
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+from games.sections import acatalog_version, catalog_version
+
+# Query parameters the cached pages read, anything else (tracking tags and such) gets the same page
+PAGE_PARAMS = ('search', 'genre', 'genre_mode', 'orderby', 'page', 'cursor')
+
+# Parts of a cached page rendered again for every request
+USER_HEADER = re.compile(r'<!-- user-header -->.*?<!-- /user-header -->', re.S)
+
+
+def page_cache_key(req, version):
+    params = sorted((name, value.strip()) for name in PAGE_PARAMS for value in req.GET.getlist(name) if value.strip())
+    page = f'{req.path}?{urlencode(params)}'
+    return f'page:{version}:{hashlib.md5(page.encode()).hexdigest()}'
+
+
+def punch_holes(req, content):
+    header = render_to_string('includes/user_header.html', request=req)
+    return USER_HEADER.sub(lambda match: f'<!-- user-header -->{header}<!-- /user-header -->', content)
+
+
+def cacheable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def cached_page(response):
+    return response.content.decode(response.charset), response['Content-Type']
+
+
+def cached_response(req, cached):
+    content, content_type = cached
+    return HttpResponse(punch_holes(req, content), content_type=content_type)
+
+
+def cache_anonymous_page(view):
+    """
+    Serve anonymous GET requests from whole pages cached for PAGE_CACHE_TTL
+    seconds under the catalog version, so any catalog change drops them.
+    Signed in players always get a fresh page. Wraps sync and async views.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(req, *args, **kwargs):
+            user = await req.auser()
+            if req.method not in ('GET', 'HEAD') or user.is_authenticated:
+                response = await view(req, *args, **kwargs)
+            else:
+                key = page_cache_key(req, await acatalog_version())
+                cached = await cache.aget(key)
+                if cached is not None:
+                    # The user header may load the session, which is blocking
+                    response = await sync_to_async(cached_response)(req, cached)
+                else:
+                    response = await view(req, *args, **kwargs)
+                    if cacheable(response):
+                        await cache.aset(key, cached_page(response), getattr(settings, 'PAGE_CACHE_TTL', 60))
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(req, *args, **kwargs):
+        if req.method not in ('GET', 'HEAD') or req.user.is_authenticated:
+            response = view(req, *args, **kwargs)
+        else:
+            key = page_cache_key(req, catalog_version())
+            cached = cache.get(key)
+            if cached is not None:
+                response = cached_response(req, cached)
+            else:
+                response = view(req, *args, **kwargs)
+                if cacheable(response):
+                    cache.set(key, cached_page(response), getattr(settings, 'PAGE_CACHE_TTL', 60))
+        patch_vary_headers(response, ['Cookie'])
+        return response
+    return wrapper
@@ -1,12 +1,37 @@
-from django.test import TestCase
+import asyncio
+import re
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import Http404
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
-from games.models import Game, Genre, DeveloperAndPublisher, GameReview
+from games.counters import ViewCounter
+from games.featured import FeaturedSampler
+from games.pagination import encode_cursor
+from games.models import Game, Genre, DeveloperAndPublisher, GameNeighbour, GameReview, GameView, RelatedGame
+from games.suggest import PrefixIndex
+from games.sections import bump_catalog_version, bump_recommendations_version
+from pages import async_views
+from pages.page_cache import punch_holes
 
 
 class ViewsTestCase(TestCase):
 
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('games.featured.featured_sampler', FeaturedSampler())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @classmethod
     def setUpTestData(cls):
         # Create developer and publisher
@@ -22,12 +47,14 @@ class ViewsTestCase(TestCase):
             game = Game.objects.create(
                 title=f"Game {i}",
                 description="Valid description " * 10,
-                publisher=cls.pub,
-                developer=cls.dev,
+                user_rating=0,
+                gameplay_duration=10,
                 rating=7.5 + (i * 0.1),
                 cover="covers/test.jpg",
                 release_date="2024-01-01"
             )
+            game.publisher.add(cls.pub)
+            game.developer.add(cls.dev)
             # Add genres to some games
             if i % 2 == 0:
                 game.genres.add(cls.genre1)
@@ -42,16 +69,16 @@ class ViewsTestCase(TestCase):
 
         # Check context keys exist
         self.assertIn('new_games', response.context)
-        self.assertIn('best_games', response.context)
+        self.assertIn('carousel_games', response.context)
         self.assertIn('featured_games', response.context)
 
         # Check ordering for new_games (descending by release_date)
         new_games = response.context['new_games']
         self.assertTrue(all(new_games[i].release_date >= new_games[i+1].release_date for i in range(len(new_games)-1)))
 
-        # Check best_games rating > 9.5
-        best_games = response.context['best_games']
-        self.assertTrue(all(game.rating > 9.5 for game in best_games))
+        # Check carousel_games rating > 9.5
+        carousel_games = response.context['carousel_games']
+        self.assertTrue(all(game.rating > 9.5 for game in carousel_games))
 
     def test_games_search_page_view_basic(self):
         url = reverse('games')
@@ -86,8 +113,38 @@ class ViewsTestCase(TestCase):
         response = self.client.get(url, {'genre': 'Action'})
         self.assertEqual(response.status_code, 200)
         games = response.context['games']
+        self.assertEqual(len(games), 10)
         self.assertTrue(all(self.genre1 in game.genres.all() for game in games))
 
+    def test_games_search_page_filter_genre_modes(self):
+        url = reverse('games')
+        both = Game.objects.get(title='Game 0')
+        both.genres.add(self.genre2)
+
+        # By slug and by id, any of them
+        response = self.client.get(url, {'genre': ['action', str(self.genre2.pk)], 'page': 2})
+        self.assertEqual(len(response.context['games']), 4)
+
+        # All of them
+        response = self.client.get(url, {'genre': ['action', 'rpg'], 'genre_mode': 'all'})
+        self.assertEqual(list(response.context['games']), [both])
+
+        # Unknown genres match nothing, not even alongside known ones when all must match
+        response = self.client.get(url, {'genre': 'racing'})
+        self.assertEqual(len(response.context['games']), 0)
+        response = self.client.get(url, {'genre': ['action', 'racing'], 'genre_mode': 'all'})
+        self.assertEqual(len(response.context['games']), 0)
+        for genre in ('\u00b2', '99999999999999999999999'):
+            response = self.client.get(url, {'genre': ['action', genre], 'genre_mode': 'all'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['games']), 0)
+
+    def test_genre_filter_uses_exists(self):
+        games = Game.objects.with_genres([self.genre1.pk, self.genre2.pk], match_all=True)
+        sql = str(games.query)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+
     def test_games_search_page_search_query(self):
         url = reverse('games')
 
@@ -111,10 +168,188 @@ class ViewsTestCase(TestCase):
         games_desc = list(response_desc.context['games'])
         self.assertEqual(games_desc, sorted(games_desc, key=lambda g: g.rating, reverse=True))
 
+    def test_games_search_page_query_count(self):
+        url = reverse('games')
+
+        # Sidebar, count, page, genres prefetch and genre filter options, regardless of page size
+        with self.assertNumQueries(5):
+            self.client.get(url, {'page': 1})
+        # The count is cached for the following pages
+        with self.assertNumQueries(4):
+            self.client.get(url, {'page': 2})
+
+    def test_games_search_page_keyset(self):
+        url = reverse('games')
+        response = self.client.get(url, {'orderby': '-rating'})
+        offset_games = list(response.context['games'])
+        self.assertIsNotNone(response.context['next_cursor'])
+
+        # Following the cursor continues exactly where page 1 stopped
+        response = self.client.get(url, {'orderby': '-rating', 'cursor': response.context['next_cursor']})
+        self.assertTrue(response.context['is_keyset'])
+        keyset_games = list(response.context['games'])
+        self.assertEqual(len(keyset_games), 4)
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertEqual(offset_games + keyset_games, list(Game.objects.order_by('-rating', '-pk')))
+
+        # And back again
+        response = self.client.get(url, {'orderby': '-rating', 'cursor': response.context['prev_cursor']})
+        self.assertEqual(list(response.context['games']), offset_games)
+        self.assertIsNone(response.context['prev_cursor'])
+
+    def test_games_search_page_bad_cursor_starts_over(self):
+        url = reverse('games')
+        cursor = self.client.get(url, {'orderby': '-rating'}).context['next_cursor']
+        first_page = list(self.client.get(url, {'orderby': 'rating'}).context['games'])
+        bad_cursors = [
+            encode_cursor([{'a': 1}], ['pk']),
+            encode_cursor(['abc', 1], ['rating', 'pk']),
+            encode_cursor([9.0], ['rating', 'pk']),
+            cursor, # Made for -rating
+            'not a cursor',
+        ]
+        for bad_cursor in bad_cursors:
+            response = self.client.get(url, {'orderby': 'rating', 'cursor': bad_cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.context['games']), first_page)
+
+    def test_games_search_page_keyset_query_count(self):
+        url = reverse('games')
+        cursor = self.client.get(url, {'orderby': '-release_date'}).context['next_cursor']
+
+        # Sidebar, page, genres prefetch and genre filter options, no COUNT(*) and no OFFSET
+        with self.assertNumQueries(4):
+            self.client.get(url, {'orderby': '-release_date', 'cursor': cursor})
+
+    def test_games_search_page_invalid_orderby(self):
+        response = self.client.get(reverse('games'), {'orderby': 'description'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['games']), list(Game.objects.order_by('pk')[:16]))
+
+    @override_settings(PAGE_CACHE_TTL=0)
+    def test_home_page_query_count(self):
+        # One query per section and the featured candidates, then every game and its genres at once
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(len(response.context['featured_games']), 5)
+        # Section ids come from the cache after that
+        with self.assertNumQueries(2):
+            self.client.get(reverse('home'))
+
+    def test_game_cards_cached(self):
+        game = Game.objects.get(title='Game 0')
+        self.assertContains(self.client.get(reverse('games')), 'Game 0')
+
+        # Cards are kept until the game itself changes
+        Game.objects.filter(pk=game.pk).update(title='Renamed Game')
+        self.assertNotContains(self.client.get(reverse('games')), 'Renamed Game')
+        game.refresh_from_db()
+        game.save()
+        self.assertContains(self.client.get(reverse('games')), 'Renamed Game')
+
+    def test_game_cards_follow_genre_changes(self):
+        self.client.get(reverse('games'))
+        genre = Genre.objects.create(name="Roguelike")
+        genre.games.add(Game.objects.get(title='Game 0'))
+        self.assertContains(self.client.get(reverse('games')), 'Roguelike</li>')
+
+    def test_games_search_page_conditional_get(self):
+        url = reverse('games')
+        response = self.client.get(url, {'orderby': '-rating'})
+        etag = response['ETag']
+        self.assertIn('Cookie', response['Vary'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'orderby': '-rating'}, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        # Another query string is another page
+        response = self.client.get(url, {'orderby': 'rating'}, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+
+        # View counts are flushed without a catalog change, the ETag moves on with time for them
+        later = time.time() + settings.SECTION_CACHE_TTL
+        with mock.patch('games.sections.time.time', return_value=later):
+            response = self.client.get(url, {'orderby': '-rating'}, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+
+        Game.objects.get(title='Game 3').save()
+        response = self.client.get(url, {'orderby': '-rating'}, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_page_cache(self):
+        self.client.get(reverse('games'), {'orderby': '-rating', 'utm_source': 'mail'})
+        # Same page whatever the order or extra parameters
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('games'), {'utm_source': 'feed', 'orderby': '-rating '})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+        self.assertContains(response, reverse('login'))
+
+        # A catalog change drops every cached page
+        Game.objects.get(title='Game 3').save()
+        self.assertIsNotNone(self.client.get(reverse('games'), {'orderby': '-rating'}).context)
+
+    def test_page_cache_skips_signed_in_players(self):
+        self.client.get(reverse('home'))
+        user = get_user_model().objects.create_user(username='player', password='pass1234')
+        self.client.force_login(user)
+        response = self.client.get(reverse('home'))
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Log out player')
+
+    def test_page_cache_punches_user_header(self):
+        request = RequestFactory().get('/')
+        request.user = get_user_model()(username='player')
+        content = '<p><!-- user-header --><a href="/accounts/login/">Log in</a><!-- /user-header --></p>'
+        self.assertIn('Log out player', punch_holes(request, content))
+        self.assertNotIn('Log in', punch_holes(request, content))
+
+    def test_home_page_sections_invalidated(self):
+        self.client.get(reverse('home'))
+        game = Game.objects.get(title='Game 3')
+        game.release_date = '2030-01-01'
+        game.save()
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['new_games'][0], game)
+
+
+class GameSuggestViewTest(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('games.suggest.suggest_index', PrefixIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.game = Game.objects.create(
+            title="Stardew Valley",
+            description="Valid description " * 10,
+            rating=9,
+            user_rating=0,
+            gameplay_duration=50,
+            cover="covers/test.jpg",
+            release_date="2016-02-26"
+        )
+
+    def test_suggest(self):
+        response = self.client.get(reverse('game_suggest'), {'q': 'star'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'results': [
+            {'id': self.game.id, 'title': 'Stardew Valley', 'subtitle': None, 'url': self.game.get_absolute_url()},
+        ]})
+
+    def test_suggest_empty_query(self):
+        response = self.client.get(reverse('game_suggest'))
+        self.assertEqual(response.json(), {'results': []})
+
 
 class GameDetailViewTest(TestCase):
 
     def setUp(self):
+        # Keep buffered views of one test from being flushed into the next
+        patcher = mock.patch('pages.views.view_counter', ViewCounter())
+        self.view_counter = patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
         # Create developer and publisher
         self.dev = DeveloperAndPublisher.objects.create(name="DevTest", is_dev=True)
         self.pub = DeveloperAndPublisher.objects.create(name="PubTest", is_pub=True)
@@ -127,13 +362,15 @@ class GameDetailViewTest(TestCase):
         self.game = Game.objects.create(
             title="Test Game",
             description="This is a test game description which is sufficiently long to pass validators.",
-            publisher=self.pub,
-            developer=self.dev,
+            user_rating=0,
+            gameplay_duration=10,
             rating=8.5,
             cover="covers/test.jpg",
             release_date="2024-01-01",
             version="1.0.0"
         )
+        self.game.publisher.add(self.pub)
+        self.game.developer.add(self.dev)
         self.game.genres.add(self.genre1, self.genre2)
 
         # Create a user for reviews
@@ -174,8 +411,182 @@ class GameDetailViewTest(TestCase):
         self.assertIn(self.review1, response.context['reviews'])
         self.assertIn(self.review2, response.context['reviews'])
 
+    def test_game_details_counts_view(self):
+        url = reverse('game_details', args=[self.game.id])
+        response = self.client.get(url)
+        self.assertEqual(response.context['game'].total_views, 1)
+
+        self.view_counter.flush()
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.total_views, self.game.monthly_views, self.game.weekly_views), (1, 1, 1))
+
+    def test_game_details_anonymous_refresh_counts_once(self):
+        url = reverse('game_details', args=[self.game.id])
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self.view_counter.pending[self.game.id], 1)
+        # Visitors without a session cookie are remembered by a signed cookie, not a session
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.assertIn('viewed_games', self.client.cookies)
+
+        # Each visitor has their own, whatever address they share
+        other = self.client_class()
+        other.get(url)
+        self.assertEqual(self.view_counter.pending[self.game.id], 2)
+        other.cookies['viewed_games'] = 'forged'
+        other.get(url)
+        self.assertEqual(self.view_counter.pending[self.game.id], 3)
+
+        # Those with a session are told apart by it
+        session = self.client.session
+        session.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self.view_counter.pending[self.game.id], 4)
+
+    def test_game_details_related_games(self):
+        url = reverse('game_details', args=[self.game.id])
+        others = [
+            Game.objects.create(title=f"Other {i}", description="A" * 150, user_rating=0, gameplay_duration=10,
+                                rating=5, cover="covers/test.jpg", release_date="2024-01-01")
+            for i in range(3)
+        ]
+        others[0].genres.add(self.genre1)
+
+        # Games sharing a genre until the related games are built
+        self.assertEqual(list(self.client.get(url).context['related_games']), [others[0]])
+
+        RelatedGame.objects.bulk_create([
+            RelatedGame(game=self.game, other=others[1], score=0.2),
+            RelatedGame(game=self.game, other=others[2], score=0.9),
+        ])
+        self.assertEqual(self.client.get(url).context['related_games'], [others[2], others[1]])
+
+    def test_game_details_also_liked_games(self):
+        url = reverse('game_details', args=[self.game.id])
+        self.assertEqual(list(self.client.get(url).context['also_liked_games']), [])
+
+        other = Game.objects.create(title="Other", description="A" * 150, user_rating=0, gameplay_duration=10,
+                                    rating=5, cover="covers/test.jpg", release_date="2024-01-01")
+        GameNeighbour.objects.create(game=self.game, other=other, similarity=0.5)
+        response = self.client.get(url)
+        self.assertEqual(list(response.context['also_liked_games']), [other])
+        self.assertContains(response, 'players who liked this also liked')
+
+    def test_game_details_cached_fragments(self):
+        cache.clear()
+        url = reverse('game_details', args=[self.game.id])
+        self.client.get(url)
+        # Studios, genres and platforms come from the cache the second time
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse(any('"games_genre"."name"' in query['sql'] for query in queries))
+
+        self.game.genres.remove(self.genre2)
+        response = self.client.get(url)
+        self.assertContains(response, '<span>Genre:</span> RPG</li>')
+
+    def test_game_details_conditional_get(self):
+        url = reverse('game_details', args=[self.game.id])
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, headers={'if-modified-since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+        # Edits elsewhere in the catalog leave it alone, new recommendations don't
+        bump_catalog_version()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+        bump_recommendations_version()
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # A new review, or someone else asking, gets the whole page
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+        response = self.client.get(url, headers={'if-modified-since': last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.client.logout()
+        self.review2.text = "Edited, the bugs were fixed in a patch."
+        self.review2.save()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
     def test_game_details_404_for_invalid_id(self):
         url = reverse('game_details', args=[9999])  # Assuming this ID does not exist
         response = self.client.get(url)
         self.assertEqual(response.status_code, 404)
 
+
+class AsyncViewsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('pages.async_views.view_counter', ViewCounter())
+        self.view_counter = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('games.featured.featured_sampler', FeaturedSampler())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.create(name="Action")
+        cls.games = []
+        for i in range(20):
+            game = Game.objects.create(title=f"Game {i}", description="A" * 150, user_rating=0, gameplay_duration=10,
+                                       rating=7.5 + i * 0.1, cover="covers/test.jpg", release_date="2024-01-01")
+            game.genres.add(cls.genre)
+            cls.games.append(game)
+        cls.user = get_user_model().objects.create_user(username='player', password='pass1234')
+
+    async def get(self, view, path, *args, user=None, headers=None):
+        req = AsyncRequestFactory().get(path, headers=headers)
+        req.session = SessionStore()
+        req.user = user or AnonymousUser()
+        async def auser():
+            return req.user
+        req.auser = auser
+        response = await view(req, *args)
+        await asyncio.gather(*async_views.background_tasks)
+        return response
+
+    def game_links(self, response):
+        return re.findall(r'href="/games/(\d+)"', response.content.decode())
+
+    @override_settings(PAGE_CACHE_TTL=0)
+    async def test_async_pages_match_sync_pages(self):
+        for path in ['/', '/games/?orderby=-rating', '/games/?orderby=-rating&page=2', '/games/?q=Game+1']:
+            view = async_views.home_page_view if path == '/' else async_views.games_search_page_view
+            response = await self.get(view, path)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.game_links(response), self.game_links(await self.async_client.get(path)), path)
+
+    async def test_async_game_list_conditional_get(self):
+        response = await self.get(async_views.games_search_page_view, '/games/')
+        self.assertIn('Cookie', response['Vary'])
+        response = await self.get(async_views.games_search_page_view, '/games/', headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_game_details(self):
+        game = self.games[0]
+        response = await self.get(async_views.game_detail_view, '/', game.pk)
+        self.assertContains(response, 'Game 0')
+        self.assertEqual(self.view_counter.pending[game.pk], 1)
+
+        response = await self.get(async_views.game_detail_view, '/', game.pk, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        # Signed-in views show up on the page that counted them, as they do in the sync view
+        response = await self.get(async_views.game_detail_view, '/', self.games[1].pk, user=self.user)
+        self.assertContains(response, '<li><span>Views:</span> 1</li>')
+        self.assertTrue(await GameView.objects.filter(user=self.user, game=self.games[1]).aexists())
+        self.assertEqual(self.view_counter.pending[self.games[1].pk], 1)
+
+    async def test_async_game_details_404_for_invalid_id(self):
+        with self.assertRaises(Http404):
+            await self.get(async_views.game_detail_view, '/', 9999)
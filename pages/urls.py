@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.urls import path
 
-from pages.views import game_detail_view, games_search_page_view, home_page_view
+from pages import async_views, views
 
+# Under ASGI the pages can be served by their async versions
+pages = async_views if getattr(settings, 'ASYNC_VIEWS', False) else views
 
 urlpatterns = [
-    path('games/<int:pk>', game_detail_view, name='game_details'),
-    path('games/', games_search_page_view, name='games'),
-    path('', home_page_view, name='home'),
+    path('games/<int:pk>', pages.game_detail_view, name='game_details'),
+    path('games/suggest', views.game_suggest_view, name='game_suggest'),
+    path('games/', pages.games_search_page_view, name='games'),
+    path('', pages.home_page_view, name='home'),
 ]
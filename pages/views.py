@@ -1,87 +1,194 @@
-from django.shortcuts import redirect, render, get_object_or_404
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import F, Avg
-from django.urls import reverse_lazy
+import hashlib
 
+from django.http import JsonResponse
+from django.shortcuts import redirect, render, get_object_or_404
+from django.db.models import Q
+from django.urls import reverse, reverse_lazy
+from django.utils.text import slugify
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from games.counters import view_counter
+from games.featured import featured_ids
 from games.forms import GameReviewForm
-from games.models import Game, Genre, GameView, GameReview
-
-def home_page_view(req):
-    games = Game.objects.all()
-
-    ctx = {
-        'trending_games': games.order_by('-weekly_views', '-user_rating')[:6],
-        'popular_games': games.order_by('-user_rating')[:6],
-        'most_viewed_games': games.order_by('-monthly_views', '-total_views')[:6],
-        'new_games': games.order_by('-release_date')[:6],
-        'carousel_games': games.filter(rating__gt=9.5, user_rating__gt=9)[:3],
-        'featured_games': games.order_by('?')[:5], # Random games to feature, definetely chagne this
+from games.models import Game, Genre, GameReview, pk_in_range
+from games.pagination import ORDERINGS, CachedCountPaginator, KeysetPage, clean_cursor, cursor_for, decode_cursor, keyset_page
+from games.search import search_games
+from games.sections import catalog_version, get_sections, recommendations_version, views_bucket
+from games.suggest import suggest_titles
+from games.tracking import record_anonymous_view, record_user_view, set_viewed_games_cookie
+from pages.page_cache import cache_anonymous_page
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+def game_list_etag(req):
+    # Edits move the catalog version and view counts the time bucket, so no query is needed to tell the list changed
+    return make_etag('games', catalog_version(), views_bucket(), req.get_full_path(), req.user.pk)
+
+def game_stamps(req, pk):
+    # When the game and its reviews last changed, looked up once per request for both validators
+    if not hasattr(req, '_game_stamps'):
+        req._game_stamps = Game.objects.filter(pk=pk).values_list('updated_at', 'reviewed_at').first()
+    return req._game_stamps
+
+def game_detail_etag(req, pk):
+    # The game's own stamps, and the version of the related and also liked games shown beside it
+    stamps = game_stamps(req, pk)
+    return make_etag('game', pk, *stamps, recommendations_version(), req.user.pk) if stamps else None
+
+def game_detail_last_modified(req, pk):
+    # A date can't tell one user's page from another's, signed-in users go by the ETag alone
+    stamps = game_stamps(req, pk)
+    return game_last_modified(stamps, req.user) if stamps else None
+
+def game_last_modified(stamps, user):
+    return None if user.is_authenticated else max(stamp for stamp in stamps if stamp)
+
+def home_context(sections):
+    return {
+        'trending_games': sections['trending'],
+        'popular_games': sections['popular'],
+        'most_viewed_games': sections['most_viewed'],
+        'new_games': sections['new'],
+        'carousel_games': sections['carousel'],
+        'featured_games': sections['featured'],
         'page_keywords': ['videogame', 'entertainment', 'game', 'gamer', 'gaming', 'list', 'trailer', 'forums', 'community'],
         'page_description': 'A web app for keeping a list of video games you have played or are planning to play',
         'page_author': 'AbyssJogger',
         'page_name': 'home',
         'page_title': 'home',
     }
-    return render(req, 'index.html', ctx)
-
-def games_search_page_view(req):
-    search_query = req.GET.get('search', '')
-    genre_filter = req.GET.get('genre', '')
-    orderby = req.GET.get('orderby', '')
-    page = req.GET.get('page', 1)
 
-    games = Game.objects.all()
-
-    most_viewed_games = games.order_by('-total_views')[:6]
-
-    if search_query:
-        games = games.filter(title__icontains=search_query)
-
-    if genre_filter:
-        games = games.filter(genres__name__in=genre_filter)
-
-    if orderby:
-        games = games.order_by(orderby)
+@cache_anonymous_page
+def home_page_view(req):
+    sections = get_sections(extra={'featured': featured_ids(5)})
+    return render(req, 'index.html', home_context(sections))
 
-    games = games.distinct()
-    genres = Genre.objects.all()
+def game_list_params(req):
+    orderby = req.GET.get('orderby', '')
+    return {
+        'search_query': req.GET.get('search', ''),
+        'genre_filter': [genre for genre in req.GET.getlist('genre') if genre],
+        'genre_mode': req.GET.get('genre_mode', 'any'),
+        'orderby': orderby if orderby in ORDERINGS else '',
+        'page': req.GET.get('page', 1),
+        'cursor': decode_cursor(req.GET['cursor']) if req.GET.get('cursor') else None,
+    }
 
-    paginator = Paginator(games, 16)
+def genre_filter_key(genre):
+    # Genres can be given by id or by slug (names slugify to their slug), numbers too big for an id are taken as slugs
+    if genre.isdecimal() and pk_in_range(Genre, int(genre)):
+        return int(genre)
+    return slugify(genre)
+
+def filtered_genres(genre_filter):
+    keys = [genre_filter_key(genre) for genre in genre_filter]
+    ids = [key for key in keys if isinstance(key, int)]
+    slugs = [key for key in keys if isinstance(key, str)]
+    return Genre.objects.filter(Q(pk__in=ids) | Q(slug__in=slugs)).values_list('pk', 'slug')
+
+def unmatched_genres(genre_filter, genres):
+    # Those asked for that none of the (pk, slug) of genres found match
+    found = {key for genre in genres for key in genre}
+    return [genre for genre in genre_filter if genre_filter_key(genre) not in found]
+
+def game_list_queryset(params, genres):
+    games = Game.objects.with_card_data()
+
+    if params['search_query']:
+        games = search_games(games, params['search_query'])
+
+    if params['genre_filter']:
+        match_all = params['genre_mode'] == 'all'
+        # A genre that does not exist matches no game, so every genre asked for can't either
+        if not genres or match_all and unmatched_genres(params['genre_filter'], genres):
+            games = games.none()
+        else:
+            games = games.with_genres([pk for pk, _ in genres], match_all)
 
-    try:
-        games_page = paginator.page(page)
-    except PageNotAnInteger:
-        games_page = paginator.page(1)
-    except EmptyPage:
-        games_page = paginator.page(paginator.num_pages)
+    # Search results keep their relevance order unless asked otherwise, and can only be paged by number
+    ordering = ORDERINGS[params['orderby']] if params['orderby'] or not params['search_query'] else None
+    if ordering:
+        games = games.order_by(*ordering)
+    return games, ordering
 
+def game_list_context(params, games_page, paginator, ordering, most_viewed_games, genres):
     ctx = {
         'most_viewed_games': most_viewed_games,
-        'games': games_page,
         'genres': genres,
-        'search_query': search_query,
-        'genre_filter': genre_filter,
-        'order_by': orderby,
+        'search_query': params['search_query'],
+        'genre_filter': params['genre_filter'],
+        'genre_mode': params['genre_mode'],
+        'order_by': params['orderby'],
         'page_title': 'MVGL - Games',
         'page_keywords': ['games', 'video games', 'search', 'filter'],
         'page_description': 'Browse and filter video games',
         'page_author': 'AbyssJogger',
         'paginator': paginator,
-        'prev_page': games_page.number - 1,
-        'curr_page': games_page.number,
+        'games': games_page,
         'is_paginated': games_page.has_other_pages(),
         'page_heading': 'Games',
         'page_name': 'games',
-        'next_pages': [x for x in range(games_page.number + 1, games_page.number + 5 - int(bool(games_page.number - 1))) if x <= paginator.num_pages], # Have at the most 5 page numbers in pagination section
     }
 
-    if search_query:
-        ctx['page_heading'] = f'Search results for "{search_query}"'
+    if isinstance(games_page, KeysetPage):
+        # Keyset pagination, as fast on page 5000 as on page 1
+        ctx.update({
+            'is_keyset': True,
+            'next_cursor': games_page.next_cursor,
+            'prev_cursor': games_page.prev_cursor,
+            'total_count': paginator.cached_count(),
+        })
+    else:
+        ctx.update({
+            'prev_page': games_page.number - 1,
+            'curr_page': games_page.number,
+            'next_pages': [x for x in range(games_page.number + 1, games_page.number + 5 - int(bool(games_page.number - 1))) if x <= paginator.num_pages], # Have at the most 5 page numbers in pagination section
+            # Lets visitors carry on past the numbered pages without OFFSET
+            'next_cursor': cursor_for(games_page[-1], ordering) if ordering and games_page.has_next() else None,
+        })
+
+    if params['search_query']:
+        ctx['page_heading'] = f'Search results for "{params["search_query"]}"'
         ctx['page_title'] = ctx['page_heading']
+    return ctx
 
+@vary_on_cookie
+@condition(etag_func=game_list_etag)
+@cache_anonymous_page
+def games_search_page_view(req):
+    params = game_list_params(req)
+    genres = list(filtered_genres(params['genre_filter'])) if params['genre_filter'] else []
+    games, ordering = game_list_queryset(params, genres)
+
+    paginator = CachedCountPaginator(games, 16)
+    cursor = clean_cursor(params['cursor'], Game, ordering) if ordering else None
+    if cursor:
+        games_page = keyset_page(games, ordering, 16, cursor)
+    else:
+        # A cursor that cannot be followed starts over from the first page
+        games_page = paginator.get_page(1 if params['cursor'] else params['page'])
+
+    most_viewed_games = Game.objects.order_by('-total_views')[:6]
+    ctx = game_list_context(params, games_page, paginator, ordering, most_viewed_games, Genre.objects.all())
     return render(req, 'game_list.html', ctx)
 
+def game_suggest_view(req):
+    try:
+        limit = min(max(int(req.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+
+    results = suggest_titles(req.GET.get('q', ''), limit)
+    for result in results:
+        result['url'] = reverse('game_details', args=[result['id']])
+    return JsonResponse({'results': results})
+
+@vary_on_cookie
+@condition(etag_func=game_detail_etag, last_modified_func=game_detail_last_modified)
 def game_detail_view(req, pk):
+    # Studios, genres and platforms are only queried when their cached fragments are missing
     game = get_object_or_404(Game, pk=pk)
     
     if req.method == 'POST':
@@ -102,38 +209,36 @@ def game_detail_view(req, pk):
                 else:
                     review.save()
 
-                avg_rating = GameReview.objects.filter(game=game).aggregate(Avg('score'))['score__avg']
-                game.user_rating = avg_rating
-                game.save()
-                
                 return redirect(reverse_lazy('game_details', kwargs={'pk':pk}))
     else:
         form = GameReviewForm()
-        changed = False
-
-        if req.user.is_authenticated:
-            _, created = GameView.objects.get_or_create(user=req.user, game=game) # Create an entry for each user that visits the page
-            if created:
-                game.total_views = F('weekly_views') + 1
-                game.total_views = F('monthly_views') + 1
-                game.total_views = F('total_views') + 1
-                game.save(update_fields=['weekly_views', 'monthly_views', 'total_views'])
-                changed = True
-        else:
-            viewed_pages = req.session.get('viewed_pages', [])
-            if pk not in viewed_pages:
-                game.total_views = F('weekly_views') + 1
-                game.total_views = F('monthly_views') + 1
-                game.total_views = F('total_views') + 1
-                game.save(update_fields=['weekly_views', 'monthly_views', 'total_views'])
-                changed = True
-       
-        if changed:
-            game.refresh_from_db() # Get the updated data if any update has happened
+        if record_view(req, req.user, game.pk):
+            view_counter.add(game.pk) # Buffered, written to the database in batches
+            game.total_views += 1
 
     reviews = game.reviews.select_related('author').all()
+    related_games = list(precomputed_related_games(game)) or genre_related_games(game)
+    ctx = game_detail_context(game, reviews, related_games, also_liked_games(game), form)
+    return set_viewed_games_cookie(req, render(req, 'game_details.html', ctx))
 
-    ctx = {
+def record_view(req, user, game_id):
+    # Whether this is the first view of the game by the user, or by the anonymous visitor
+    if user.is_authenticated:
+        return record_user_view(user.pk, game_id) # Create an entry for each user that visits the page
+    return record_anonymous_view(req, game_id)
+
+def precomputed_related_games(game):
+    # Filled by build_related_games, games added since then fall back to sharing a genre
+    return Game.objects.filter(related_to__game=game).order_by('-related_to__score')[:5]
+
+def genre_related_games(game):
+    return Game.objects.filter(genres__in=game.genres.all()).exclude(id=game.id).distinct()[:5]
+
+def also_liked_games(game):
+    return Game.objects.filter(neighbour_of__game=game).order_by('-neighbour_of__similarity')[:5]
+
+def game_detail_context(game, reviews, related_games, also_liked_games, form):
+    return {
         'game': game,
         'reviews': reviews,
         'page_title': f'{game.title}',
@@ -141,7 +246,7 @@ def game_detail_view(req, pk):
         'page_description': game.description,
         'page_author': 'AbyssJogger',
         'page_name': 'game_detail',
-        'related_games': Game.objects.filter(genres__in=game.genres.all()).exclude(id=game.id).distinct()[:5],
+        'related_games': related_games,
+        'also_liked_games': also_liked_games,
         'review_form': form
     }
-    return render(req, 'game_details.html', ctx)
@@ -36,7 +36,12 @@
     --------------------*/
     $('.set-bg').each(function () {
         var bg = $(this).data('setbg');
+        var webp = $(this).data('setbg-webp');
         $(this).css('background-image', 'url(' + bg + ')');
+        // Browsers without image-set() ignore it and keep the JPEG
+        if (webp) {
+            $(this).css('background-image', 'image-set(url(' + webp + ') type("image/webp"), url(' + bg + ') type("image/jpeg"))');
+        }
     });
 
     // Search model